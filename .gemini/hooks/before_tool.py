@@ -1,48 +0,0 @@
-#!/usr/bin/env -S uv run --script
-# /// script
-# requires-python = ">=3.10"
-# dependencies = ["requests"]
-# ///
-"""BeforeTool hook (Gemini CLI) — maps to PreToolUse."""
-
-import json
-import os
-import sys
-import requests
-
-sys.stdout = sys.stderr
-
-SERVER_URL = os.environ.get("OBSERVABILITY_SERVER_URL", "http://localhost:4000")
-
-
-def main() -> None:
-    try:
-        raw = sys.stdin.read()
-        if not raw.strip():
-            return
-        data = json.loads(raw)
-    except (json.JSONDecodeError, Exception):
-        return
-
-    session_id = data.get("session_id") or os.environ.get("GEMINI_SESSION_ID", "unknown")
-    tool_name = data.get("tool_name", "")
-    tool_input = data.get("tool_input", {})
-
-    event = {
-        "source_app": "gemini-cli",
-        "session_id": session_id,
-        "hook_event_type": "PreToolUse",
-        "payload": {
-            "tool_name": tool_name,
-            "tool_input": tool_input,
-        },
-    }
-
-    try:
-        requests.post(f"{SERVER_URL}/events", json=event, timeout=2)
-    except Exception:
-        pass
-
-
-if __name__ == "__main__":
-    main()
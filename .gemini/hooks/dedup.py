@@ -0,0 +1,122 @@
+"""Content-addressed dedup of large payload fragments.
+
+Within a session the same large values are sent over and over: BeforeTool and
+AfterTool both carry ``tool_input``, and the same file contents or prompts
+recur. Each fragment of at least ``OBSERVABILITY_DEDUP_MIN_BYTES`` is hashed,
+and the hashes already delivered for the session are kept in a small LRU in
+the session state file (state.py).
+
+Wire format (events carry ``"payload_refs": true`` when either form is used):
+
+- ``{"$blob": "<sha256>", "value": ...}`` — first send; the server stores it
+- ``{"$ref": "<sha256>"}`` — repeat; the server substitutes the stored value
+
+Fragments are large strings at any depth and whole top-level payload
+values. A top-level value is hashed with its large strings in ``$ref`` form,
+so its hash doesn't depend on which of those strings were new.
+"""
+
+import hashlib
+import json
+import os
+
+import state
+
+DEDUP_ENABLED = os.environ.get("OBSERVABILITY_DEDUP", "1") not in ("", "0")
+MIN_BYTES = int(os.environ.get("OBSERVABILITY_DEDUP_MIN_BYTES", "1024"))
+LRU_SIZE = 512
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode(
+        "utf-8", "surrogatepass"
+    )
+
+
+def _ref_form(value):
+    """Replace inline definitions with references (the form blobs are hashed and stored in)."""
+    if isinstance(value, dict):
+        if "$blob" in value and len(value) == 2:
+            return {"$ref": value["$blob"]}
+        return {k: _ref_form(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_ref_form(v) for v in value]
+    return value
+
+
+class _Deduper:
+    def __init__(self, sent: list[str]):
+        self.sent = set(sent)
+        self.new: list[str] = []
+        self.hits: list[str] = []
+
+    def _fragment(self, digest: str, value, inner_new: list[str]):
+        if digest in self.sent:
+            self.hits.append(digest)
+            return {"$ref": digest}
+        self.new.extend(inner_new)
+        self.new.append(digest)
+        self.sent.add(digest)
+        return {"$blob": digest, "value": value}
+
+    def strings(self, value, new: list[str]):
+        """Wire form of ``value`` with large strings deduped. New hashes go to ``new``."""
+        if isinstance(value, str):
+            if len(value) < MIN_BYTES and len(value.encode("utf-8", "surrogatepass")) < MIN_BYTES:
+                return value
+            digest = _digest(value.encode("utf-8", "surrogatepass"))
+            if digest in self.sent:
+                self.hits.append(digest)
+                return {"$ref": digest}
+            new.append(digest)
+            return {"$blob": digest, "value": value}
+        if isinstance(value, dict):
+            return {k: self.strings(v, new) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.strings(v, new) for v in value]
+        return value
+
+    def payload(self, payload: dict) -> dict:
+        out = {}
+        for key, value in payload.items():
+            inner_new: list[str] = []
+            wire = self.strings(value, inner_new)
+            if isinstance(wire, (dict, list)) and not _is_marker(wire):
+                canonical = _canonical(_ref_form(wire))
+                if len(canonical) >= MIN_BYTES:
+                    out[key] = self._fragment(_digest(canonical), wire, inner_new)
+                    continue
+            self.new.extend(inner_new)
+            self.sent.update(inner_new)
+            out[key] = wire
+        return out
+
+
+def _is_marker(value) -> bool:
+    return isinstance(value, dict) and ("$ref" in value or "$blob" in value) and len(value) <= 2
+
+
+def dedup_payload(session_id: str, payload: dict) -> tuple[dict, bool, list[str], list[str]]:
+    """Return (wire payload, uses_refs, new hashes, reused hashes) for ``payload``."""
+    if not DEDUP_ENABLED:
+        return payload, False, [], []
+    sent = state.load(session_id).get("sent", [])
+    deduper = _Deduper(sent)
+    wire = deduper.payload(payload)
+    return wire, bool(deduper.new or deduper.hits), deduper.new, deduper.hits
+
+
+def record_sent(session_id: str, new: list[str], hits: list[str]) -> None:
+    """Mark hashes as delivered, most recent last, keeping the newest LRU_SIZE."""
+    if not (new or hits):
+        return
+    touched = list(dict.fromkeys(hits + new))
+    with state.update(session_id) as data:
+        sent = [h for h in data.get("sent", []) if h not in set(touched)]
+        sent.extend(touched)
+        data["sent"] = sent[-LRU_SIZE:]
+
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Single entry point for every Gemini CLI hook.
+
+Wired in .gemini/settings.json as::
+
+    python3 -IS $GEMINI_PROJECT_DIR/.gemini/hooks/dispatch.py <GeminiEvent>
+
+Stdlib only, so it runs on a bare interpreter without uv. ``-I`` drops the
+script directory from sys.path, so we add it back ourselves.
+"""
+
+import os
+import sys
+import time
+
+# Taken before anything else runs, for hook phase timing (timing.py)
+INTERPRETER_MS = time.process_time() * 1000
+STARTED = time.perf_counter()
+
+HOOKS_DIR = os.path.dirname(os.path.abspath(__file__))
+if HOOKS_DIR not in sys.path:
+    sys.path.insert(0, HOOKS_DIR)
+
+from send_event import home_stores, on_home_shard, post_event  # noqa: E402  (also redirects stdout → stderr)
+from timing import SINKS, HookTimer, TimedReader  # noqa: E402
+
+SOURCE_APP = "gemini-cli"
+
+# Gemini CLI event → server event type
+EVENT_TYPES = {
+    "SessionStart": "SessionStart",
+    "SessionEnd": "SessionEnd",
+    "BeforeTool": "PreToolUse",
+    "AfterTool": "PostToolUse",
+    "BeforeAgent": "UserPromptSubmit",
+    "AfterAgent": "Stop",
+    "Notification": "Notification",
+    "PreCompress": "PreCompact",
+}
+
+
+def read_input(stream) -> dict | None:
+    """Parse the hook's JSON context from stdin. Returns None on empty or bad input.
+
+    Oversized strings (e.g. a large AfterTool tool_response) are cut to
+    head/tail slices while streaming, so they are never held in full; the
+    cuts are listed under ``truncated_fields``.
+    """
+    from stream_json import load_shaped
+
+    try:
+        data = load_shaped(stream)
+    except (ValueError, OSError):
+        return None
+    if data is None:
+        return None
+    return data if isinstance(data, dict) else {"raw": data}
+
+
+def build_payload(gemini_event: str, data: dict) -> dict:
+    """Tool hooks send a trimmed payload; lifecycle hooks forward the full context."""
+    if gemini_event not in ("BeforeTool", "AfterTool"):
+        return data
+    payload = {
+        "tool_name": data.get("tool_name", ""),
+        "tool_input": data.get("tool_input", {}),
+    }
+    if gemini_event == "AfterTool" and data.get("tool_response") is not None:
+        payload["tool_response"] = data["tool_response"]
+    if data.get("truncated_fields"):
+        payload["truncated_fields"] = data["truncated_fields"]
+    return payload
+
+
+def hook_latency_ms(data: dict, observed_at: float) -> float | None:
+    """Delay between Gemini stamping the hook input and this hook starting, if stamped."""
+    stamp = data.get("timestamp")
+    if not isinstance(stamp, str):
+        return None
+    from datetime import datetime
+
+    try:
+        emitted = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if emitted.tzinfo is None:
+        return None
+    return round((observed_at - emitted.timestamp()) * 1000, 1)
+
+
+def pair_and_sample(
+    gemini_event: str, session_id: str, hook_event_type: str, payload: dict, data: dict, observed_at: float
+) -> tuple[bool, dict | None]:
+    """Attach span fields to tool payloads and decide whether to send the event.
+
+    Returns (keep, rollup payload or None); see sampling.py. An AfterTool
+    follows the sampling decision of the BeforeTool it pairs with.
+    """
+    from sampling import admit
+    from spans import end_span, start_span
+
+    if gemini_event not in ("BeforeTool", "AfterTool"):
+        return admit(session_id, hook_event_type, payload, observed_at)
+
+    tool_name, tool_input = payload["tool_name"], payload["tool_input"]
+    latency = hook_latency_ms(data, observed_at)
+    if gemini_event == "AfterTool":
+        paired = None
+        span = end_span(session_id, tool_name, tool_input, observed_at)
+        if span is not None:
+            paired = span.pop("sampled")
+            payload.update(span)
+        if latency is not None:
+            payload["hook_latency_ms"] = latency
+        return admit(session_id, hook_event_type, payload, observed_at, paired)
+
+    keep, rollup = admit(session_id, hook_event_type, payload, observed_at)
+    payload["span_id"] = start_span(session_id, tool_name, tool_input, observed_at, sampled=keep)
+    if latency is not None:
+        payload["hook_latency_ms"] = latency
+    return keep, rollup
+
+
+def dispatch(gemini_event: str) -> None:
+    observed_at = time.time()
+    timer = HookTimer(INTERPRETER_MS, STARTED)
+    timer.mark("imports")
+    hook_event_type = EVENT_TYPES.get(gemini_event)
+    if hook_event_type is None:
+        return
+
+    stdin = TimedReader(sys.stdin)
+    data = read_input(stdin)
+    timer.mark("parse")
+    timer.split_read(stdin)
+    if data is None:
+        return
+
+    import state
+    from dedup import dedup_payload, record_sent
+    from sampling import ROLLUP_EVENT_TYPE
+
+    session_id = data.get("session_id") or os.environ.get("GEMINI_SESSION_ID", "unknown")
+    payload = build_payload(gemini_event, data)
+    keep, rollup = pair_and_sample(gemini_event, session_id, hook_event_type, payload, data, observed_at)
+    timer.mark("build")
+    if rollup is not None:
+        post_event({
+            "source_app": SOURCE_APP,
+            "session_id": session_id,
+            "hook_event_type": ROLLUP_EVENT_TYPE,
+            "payload": rollup,
+        })
+        timer.mark("send")
+
+    route = None
+    if keep:
+        event = {
+            "source_app": SOURCE_APP,
+            "session_id": session_id,
+            "hook_event_type": hook_event_type,
+            "payload": payload,
+        }
+        # Refs only resolve on the server holding the session's blobs, so
+        # skip dedup while failed over to another shard, and keep the full
+        # event for any attempt that fails over mid-send
+        full, new_hashes, reused_hashes = None, [], []
+        if on_home_shard(session_id):
+            wire, uses_refs, new_hashes, reused_hashes = dedup_payload(session_id, payload)
+            if uses_refs:
+                full = event
+                event = {**event, "payload": wire, "payload_refs": True}
+        timer.mark("build")
+        if "payload" in SINKS:
+            payload["hook_timing_ms"] = event["payload"]["hook_timing_ms"] = timer.snapshot()
+        route = post_event(event, full)
+        timer.mark("send")
+
+    delivered = route is not None
+    if gemini_event == "SessionEnd":
+        state.clear(session_id)
+    elif home_stores(route, session_id):
+        # Only count blobs as sent once the home server is bound to store
+        # them, or later $refs to them would never resolve
+        record_sent(session_id, new_hashes, reused_hashes)
+    if gemini_event == "SessionStart":
+        state.prune()
+    timer.write({"hook": gemini_event, "session_id": session_id, "sent": keep, "delivered": delivered})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"usage: dispatch.py <{'|'.join(EVENT_TYPES)}>")
+        sys.exit(2)
+    dispatch(sys.argv[1])
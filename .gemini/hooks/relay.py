@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Local relay daemon: batches hook events onto one keep-alive connection.
+
+Hooks hand events over a Unix domain socket (one JSON object per line) and
+return immediately. The relay coalesces them and flushes to
+``POST /events/batch`` when a batch fills up or the flush interval elapses.
+
+Enable with ``OBSERVABILITY_RELAY=1``. The first hook that finds no relay
+running starts one with ``--idle-exit``; ``scripts/start-system.sh`` starts a
+long-lived one. With ``OBSERVABILITY_SPOOL=1`` as well, batches the server
+doesn't accept go to the on-disk spool and the relay replays it periodically;
+while the spool holds a backlog, new batches are appended behind it so events
+reach the server in order.
+With several servers (``OBSERVABILITY_SERVER_URLS``), each batch is split by
+session shard and every server gets its own keep-alive connection.
+Stdlib only so it can run without uv.
+"""
+
+import argparse
+import fcntl
+import http.client
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from send_event import (SERVER_URLS, SPOOL_ENABLED, deliver_batch, encode_body, get_spool, group_by_shard,
+                        relay_socket_path)
+from spool import take_batch
+
+BATCH_MAX_EVENTS = int(os.environ.get("OBSERVABILITY_RELAY_BATCH", "100"))
+FLUSH_INTERVAL = float(os.environ.get("OBSERVABILITY_RELAY_FLUSH_MS", "200")) / 1000
+QUEUE_MAX = 10_000
+SPOOL_DRAIN_INTERVAL = 5.0
+
+
+def log(msg: str) -> None:
+    print(f"[relay] {msg}", file=sys.stderr, flush=True)
+
+
+class ServerConnection:
+    """A single keep-alive HTTP connection to the observability server."""
+
+    def __init__(self, base_url: str, timeout: float = 5.0):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.conn: http.client.HTTPConnection | None = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.conn = cls(self.host, self.port, timeout=self.timeout)
+        return self.conn
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def post(self, path: str, body: dict) -> int:
+        """POST a JSON body, reconnecting once if the pooled connection went stale."""
+        data, headers = encode_body(body)
+        for attempt in range(2):
+            conn = self._connect()
+            try:
+                conn.request("POST", self.prefix + path, body=data, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.will_close:
+                    self.close()
+                return resp.status
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+        return 0
+
+
+class Relay:
+    def __init__(self, socket_path: str, server_urls: list[str], idle_exit: float):
+        self.socket_path = socket_path
+        self.servers = {url: ServerConnection(url) for url in server_urls}
+        self.idle_exit = idle_exit
+        self.events: queue.Queue = queue.Queue(maxsize=QUEUE_MAX)
+        self.last_activity = time.monotonic()
+        self.stopping = threading.Event()
+
+    # ─── Intake ───
+
+    def _handle_client(self, conn: socket.socket) -> None:
+        buf = b""
+        with conn:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        for line in buf.splitlines():
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Stamp on receipt so batching delay doesn't skew event times
+            if not event.get("timestamp"):
+                event["timestamp"] = int(time.time() * 1000)
+            try:
+                self.events.put_nowait(event)
+            except queue.Full:
+                log("queue full, dropping event")
+        self.last_activity = time.monotonic()
+
+    def _accept_loop(self, listener: socket.socket) -> None:
+        listener.settimeout(1.0)
+        while not self.stopping.is_set():
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+
+    # ─── Delivery ───
+
+    def _post(self, url: str, batch: list[dict]) -> int:
+        try:
+            status = self.servers[url].post("/events/batch", {"events": batch})
+        except Exception as e:
+            log(f"failed to deliver batch of {len(batch)} to {url}: {e}")
+            return 0
+        if status >= 400:
+            log(f"server rejected batch of {len(batch)} (HTTP {status})")
+        return status
+
+    def _send(self, batch: list[dict]) -> list[dict]:
+        """Deliver a batch, split by shard. Returns the events to retry later."""
+        rejected = []
+        for order, group in group_by_shard(batch, list(self.servers)):
+            if len(order) == 1:
+                rejected += deliver_batch(group, lambda events: self._post(order[0], events))
+            else:
+                from shards import post_with_failover
+
+                rejected += deliver_batch(group, lambda events: post_with_failover(
+                    order, lambda url: self._post(url, events))[0])
+        return rejected
+
+    def _flush(self, batch: list[dict]) -> None:
+        if SPOOL_ENABLED and self._spool_backlog():
+            # Queue behind the spooled events: they may define $blobs that
+            # this batch refers to, so they must reach the server first
+            self._spool(batch)
+            return
+        rejected = self._send(batch)
+        if rejected and SPOOL_ENABLED:
+            # Keep undelivered events on disk for the next drain
+            self._spool(rejected)
+
+    def _spool(self, events: list[dict]) -> None:
+        try:
+            spool = get_spool()
+            for event in events:
+                spool.append(event)
+        except OSError as e:
+            log(f"failed to spool batch of {len(events)}: {e}")
+
+    def _spool_backlog(self) -> bool:
+        """Whether spooled events are still waiting, after trying to replay them."""
+        try:
+            spool = get_spool()
+            if spool.pending_bytes() and not spool.backing_off():
+                self._drain_spool()
+            return spool.pending_bytes() > 0
+        except OSError:
+            return False
+
+    def _drain_spool(self) -> None:
+        try:
+            drained = get_spool().drain(self._send)
+        except OSError:
+            return
+        if drained.sent:
+            log(f"replayed {drained.sent} spooled event(s)")
+
+    def _flush_loop(self) -> None:
+        next_drain = time.monotonic()
+        while not (self.stopping.is_set() and self.events.empty()):
+            if SPOOL_ENABLED and time.monotonic() >= next_drain:
+                self._drain_spool()
+                next_drain = time.monotonic() + SPOOL_DRAIN_INTERVAL
+            try:
+                first = self.events.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_MAX_EVENTS:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.events.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Keep each request under the server's batch size limit
+            while batch:
+                count = take_batch(batch, BATCH_MAX_EVENTS)
+                self._flush(batch[:count])
+                batch = batch[count:]
+
+    # ─── Lifecycle ───
+
+    def serve(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(128)
+        log(f"listening on {self.socket_path} → {', '.join(self.servers)}")
+
+        flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        flusher.start()
+        accepter = threading.Thread(target=self._accept_loop, args=(listener,), daemon=True)
+        accepter.start()
+
+        # start-system.sh stops the relay with SIGTERM: shut down the same
+        # way as on Ctrl-C, flushing queued events first. The main thread
+        # only sleeps, so setting the event from the handler can't deadlock.
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
+        try:
+            while not self.stopping.is_set():
+                time.sleep(1.0)
+                idle = time.monotonic() - self.last_activity
+                if self.idle_exit and idle > self.idle_exit and self.events.empty():
+                    log(f"idle for {int(idle)}s, exiting")
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping.set()
+            listener.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            flusher.join(timeout=5)
+            for server in self.servers.values():
+                server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batching relay for observability hook events")
+    parser.add_argument("--socket", default=relay_socket_path(), help="Unix socket path")
+    parser.add_argument("--server", default=",".join(SERVER_URLS),
+                        help="Observability server URL (comma-separated to shard across several)")
+    parser.add_argument("--idle-exit", type=float, default=0,
+                        help="Exit after this many idle seconds (0 = run forever)")
+    args = parser.parse_args()
+
+    # Only one relay per socket: hold an exclusive lock for our lifetime
+    lock_file = open(args.socket + ".lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return
+
+    servers = [url.strip().rstrip("/") for url in args.server.split(",") if url.strip()]
+    Relay(args.socket, servers, args.idle_exit).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-session sampling of tool events, with rollups of what was suppressed.
+
+An agent stuck in a tight tool loop fires BeforeTool/AfterTool many times a
+second, and dozens of such sessions flood ``/events`` and the WebSocket
+broadcast. With ``OBSERVABILITY_SAMPLE_RATE`` set, each session gets a token
+bucket in its state file (state.py): ``OBSERVABILITY_SAMPLE_RATE`` tokens per
+second up to ``OBSERVABILITY_SAMPLE_BURST``. A tool call costs one token when
+its BeforeTool fires, and its AfterTool follows the same decision so PreToolUse
+and PostToolUse stay paired. Failed tool calls and every non-tool event
+(SessionStart, SessionEnd, UserPromptSubmit, ...) are always kept.
+
+Suppressed events are counted per tool name and event type. Once per
+``OBSERVABILITY_SAMPLE_WINDOW`` seconds, and at SessionEnd, the counts are
+sent as a ``SampledRollup`` event so totals on the dashboard stay accurate.
+"""
+
+import os
+
+import state
+
+SAMPLE_RATE = float(os.environ.get("OBSERVABILITY_SAMPLE_RATE") or 0)
+SAMPLE_BURST = float(os.environ.get("OBSERVABILITY_SAMPLE_BURST", "20"))
+SAMPLE_WINDOW = float(os.environ.get("OBSERVABILITY_SAMPLE_WINDOW", "10"))
+SAMPLING_ENABLED = SAMPLE_RATE > 0
+
+SAMPLED_TYPES = {"PreToolUse", "PostToolUse"}
+ROLLUP_EVENT_TYPE = "SampledRollup"
+
+
+def is_error(payload: dict) -> bool:
+    response = payload.get("tool_response")
+    if not isinstance(response, dict):
+        return False
+    return bool(response.get("error") or response.get("is_error")) or response.get("success") is False
+
+
+def _take_token(data: dict, now: float) -> bool:
+    bucket = data.get("bucket") or {"tokens": SAMPLE_BURST, "at": now}
+    tokens = min(SAMPLE_BURST, bucket["tokens"] + max(now - bucket["at"], 0) * SAMPLE_RATE)
+    keep = tokens >= 1
+    data["bucket"] = {"tokens": tokens - keep, "at": now}
+    return keep
+
+
+def _rollup(data: dict, now: float) -> dict:
+    window = data.pop("suppressed")
+    counts = window["counts"]
+    return {
+        "window_start": int(window["since"] * 1000),
+        "window_end": int(now * 1000),
+        "suppressed": counts,
+        "suppressed_total": sum(n for by_type in counts.values() for n in by_type.values()),
+        "sample_rate": SAMPLE_RATE,
+        "sample_burst": SAMPLE_BURST,
+    }
+
+
+def _window_due(window: dict | None, hook_event_type: str, now: float) -> bool:
+    if not window:
+        return False
+    return hook_event_type == "SessionEnd" or now - window["since"] >= SAMPLE_WINDOW
+
+
+def admit(
+    session_id: str, hook_event_type: str, payload: dict, now: float, paired: bool | None = None
+) -> tuple[bool, dict | None]:
+    """Decide whether to send an event. Returns (keep, rollup payload or None).
+
+    ``paired`` is the decision already made for this call's BeforeTool, if known.
+    """
+    if not SAMPLING_ENABLED:
+        return True, None
+    sampled = hook_event_type in SAMPLED_TYPES and not is_error(payload)
+    if not sampled and not _window_due(state.load(session_id).get("suppressed"), hook_event_type, now):
+        return True, None
+
+    with state.update(session_id) as data:
+        keep = True
+        if sampled:
+            keep = paired if paired is not None else _take_token(data, now)
+        if not keep:
+            window = data.setdefault("suppressed", {"since": now, "counts": {}})
+            by_type = window["counts"].setdefault(payload.get("tool_name") or "unknown", {})
+            by_type[hook_event_type] = by_type.get(hook_event_type, 0) + 1
+        rollup = _rollup(data, now) if _window_due(data.get("suppressed"), hook_event_type, now) else None
+    return keep, rollup
@@ -1,14 +1,14 @@
-#!/usr/bin/env -S uv run --script
-# /// script
-# requires-python = ">=3.10"
-# dependencies = ["requests"]
-# ///
-"""Shared helper: POST a hook event to the observability server (Gemini CLI)."""
+#!/usr/bin/env python3
+"""Shared transport: deliver hook events to the observability server (Gemini CLI).
+
+Stdlib only and import-light — every hook invocation pays for whatever this
+module imports, so anything beyond json/os/sys is imported where it's used.
+"""
 
 import json
 import os
 import sys
-import requests
+from collections.abc import Callable
 
 # Gemini CLI parses stdout as JSON — redirect stdout to stderr so stray
 # prints from libraries never corrupt the response.
@@ -16,46 +16,324 @@ sys.stdout = sys.stderr
 
 SERVER_URL = os.environ.get("OBSERVABILITY_SERVER_URL", "http://localhost:4000")
 
+# Optional list of servers to shard sessions across (shards.py)
+SERVER_URLS = [
+    url.strip().rstrip("/") for url in os.environ.get("OBSERVABILITY_SERVER_URLS", "").split(",") if url.strip()
+] or [SERVER_URL]
 
-def send_event(hook_event_type: str, extra: dict | None = None) -> None:
-    """Read hook data from stdin and POST it to the server."""
-    try:
-        raw = sys.stdin.read()
-        if not raw.strip():
-            return
+# Opt-in: hand events to the local relay daemon (relay.py) instead of POSTing
+RELAY_ENABLED = os.environ.get("OBSERVABILITY_RELAY", "") not in ("", "0")
 
-        data = json.loads(raw)
-    except (json.JSONDecodeError, Exception):
-        return
+# Opt-in: append events to an on-disk spool (spool.py) and replay it in bulk
+SPOOL_ENABLED = os.environ.get("OBSERVABILITY_SPOOL", "") not in ("", "0")
+
+# A hook replays at most one spooled batch, with this timeout; any backlog is
+# left to a detached ``send_event.py --drain``
+HOOK_DRAIN_TIMEOUT = 0.25
+
+# Request bodies at least this large are gzip-compressed (0 disables)
+COMPRESS_MIN_BYTES = int(os.environ.get("OBSERVABILITY_COMPRESS_MIN_BYTES", "8192"))
 
-    session_id = data.get("session_id") or os.environ.get("GEMINI_SESSION_ID", "unknown")
-    source_app = "gemini-cli"
 
-    payload = data if isinstance(data, dict) else {"raw": data}
+def state_dir() -> str:
+    """Per-user directory for hook runtime state (relay socket, spool)."""
+    path = os.environ.get("OBSERVABILITY_STATE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "agentland-observability"
+    )
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
 
-    event = {
-        "source_app": source_app,
-        "session_id": session_id,
-        "hook_event_type": hook_event_type,
-        "payload": payload,
-        "timestamp": None,  # server will set it
-    }
 
-    # Merge any extra fields
-    if extra:
-        event.update(extra)
+def relay_socket_path() -> str:
+    return os.environ.get("OBSERVABILITY_RELAY_SOCKET") or os.path.join(state_dir(), "relay.sock")
 
+
+def spawn_detached(script: str, *args: str) -> None:
+    """Start a sibling script in the background, detached from the hook's session."""
+    import subprocess
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
     try:
-        requests.post(
-            f"{SERVER_URL}/events",
-            json=event,
-            timeout=2,
+        subprocess.Popen(
+            [sys.executable, path, *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
         )
-    except Exception:
-        pass  # Don't block the agent if the server is down
+    except OSError:
+        pass
+
+
+def start_relay() -> None:
+    """Spawn the relay daemon in the background. A second instance exits on its own."""
+    spawn_detached("relay.py", "--idle-exit", "600")
+
+
+def send_to_relay(event: dict) -> bool:
+    """Hand the event to the relay over its Unix socket. Returns False if it isn't running."""
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(0.5)
+    try:
+        sock.connect(relay_socket_path())
+        sock.sendall(json.dumps(event).encode("utf-8") + b"\n")
+        return True
+    except (FileNotFoundError, ConnectionRefusedError):
+        start_relay()
+        return False
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def encode_body(body: dict) -> tuple[bytes, dict]:
+    """Serialize a JSON request body, gzip-compressing it when it's large enough to pay off."""
+    data = json.dumps(body).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if COMPRESS_MIN_BYTES and len(data) >= COMPRESS_MIN_BYTES:
+        import zlib
+
+        gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        data = gz.compress(data) + gz.flush()
+        headers["Content-Encoding"] = "gzip"
+    return data, headers
+
+
+def _post_plain(host: str, port: int, path: str, body: bytes, headers: dict, timeout: float) -> int:
+    """Minimal HTTP/1.1 POST over a raw socket.
+
+    http.client pulls in email.* and ssl (~40ms of imports); for the common
+    plain-http localhost case a hand-written request is all we need.
+    """
+    import socket
+
+    lines = [f"POST {path} HTTP/1.1", f"Host: {host}:{port}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines += [f"Content-Length: {len(body)}", "Connection: close", "", ""]
+    request = "\r\n".join(lines).encode("latin-1") + body
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(request)
+            head = b""
+            while b"\r\n" not in head:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                head += chunk
+        return int(head.split(b" ", 2)[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def http_post(path: str, body: dict, timeout: float = 2.0, base_url: str = SERVER_URL) -> int:
+    """POST a JSON body to a server. Returns the HTTP status, or 0 if unreachable."""
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(base_url)
+    data, headers = encode_body(body)
+    url_path = parts.path.rstrip("/") + path
+    if parts.scheme != "https":
+        return _post_plain(parts.hostname or "localhost", parts.port or 80, url_path, data, headers, timeout)
+
+    import http.client
+
+    conn = http.client.HTTPSConnection(parts.hostname or "localhost", parts.port, timeout=timeout)
+    try:
+        conn.request("POST", url_path, body=data, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    except (http.client.HTTPException, OSError):
+        return 0
+    finally:
+        conn.close()
+
+
+def post_routed(path: str, body: dict, session_id: str, failover_body: dict | None = None) -> tuple[int, str]:
+    """POST to the session's server: SERVER_URL, or its shard when several are configured.
+
+    ``failover_body``, if given, is sent instead of ``body`` to any server
+    other than the session's home shard. Returns the HTTP status (0 if
+    unreachable) and the server that answered.
+    """
+    if len(SERVER_URLS) == 1:
+        return http_post(path, body, base_url=SERVER_URLS[0]), SERVER_URLS[0]
+    from shards import post_with_failover, preference
+
+    order = preference(session_id, SERVER_URLS)
+    if failover_body is None:
+        failover_body = body
+
+    def post_to(url: str) -> int:
+        return http_post(path, body if url == order[0] else failover_body, base_url=url)
+
+    return post_with_failover(order, post_to)
+
+
+def home_shard(session_id: str) -> str:
+    """The server that owns the session's events (and its stored blobs)."""
+    if len(SERVER_URLS) == 1:
+        return SERVER_URLS[0]
+    from shards import preference
+
+    return preference(session_id, SERVER_URLS)[0]
+
+
+def on_home_shard(session_id: str) -> bool:
+    """False while the session's own server is marked down and its events fail over elsewhere."""
+    if len(SERVER_URLS) == 1:
+        return True
+    import time
+
+    from shards import Health, preference
+
+    return Health().is_up(preference(session_id, SERVER_URLS)[0], time.time())
+
+
+def get_spool():
+    from spool import Spool
+
+    return Spool(os.path.join(state_dir(), "spool"))
+
+
+def group_by_shard(events: list[dict], urls: list[str] = SERVER_URLS) -> list[tuple[list[str], list[dict]]]:
+    """Split a batch by target shard, keeping event order within each group.
+
+    Returns (endpoint preference order, events) pairs; a single group when
+    only one server is configured.
+    """
+    if len(urls) == 1:
+        return [(urls, events)]
+    from shards import preference
+
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for event in events:
+        groups.setdefault(tuple(preference(event.get("session_id", ""), urls)), []).append(event)
+    return [(list(order), group) for order, group in groups.items()]
+
+
+def retryable(status: int) -> bool:
+    """Whether a failed POST may succeed later: unreachable, 5xx, 408 or 429."""
+    return status == 0 or status >= 500 or status in (408, 429)
+
+
+def deliver_batch(events: list[dict], post: Callable[[list[dict]], int]) -> list[dict]:
+    """Send a batch with ``post(events) -> HTTP status``. Returns the events to retry later.
+
+    A batch refused as too large (413) is split in half and each half sent on
+    its own. Other client errors won't go away on retry, so those events are
+    dropped (and logged) rather than blocking everything queued behind them.
+    """
+    status = post(events)
+    if 200 <= status < 300:
+        return []
+    if status == 413 and len(events) > 1:
+        half = len(events) // 2
+        return deliver_batch(events[:half], post) + deliver_batch(events[half:], post)
+    if retryable(status):
+        return events
+    print(f"[observability] server refused {len(events)} event(s) with HTTP {status}, dropping them", file=sys.stderr)
+    return []
+
+
+def post_batch(events: list[dict], timeout: float = 2.0) -> list[dict]:
+    """POST a batch to /events/batch, split by shard. Returns the events to retry later."""
+    if len(SERVER_URLS) == 1:
+        return deliver_batch(events, lambda batch: http_post("/events/batch", {"events": batch}, timeout, SERVER_URLS[0]))
+    from shards import post_with_failover
+
+    rejected = []
+    for order, group in group_by_shard(events):
+        rejected += deliver_batch(group, lambda batch: post_with_failover(
+            order, lambda url: http_post("/events/batch", {"events": batch}, timeout, url))[0])
+    return rejected
+
+
+def drain_spool() -> int:
+    """Replay the whole spool unless another process is already doing so."""
+    try:
+        return get_spool().drain(post_batch).sent
+    except OSError:
+        return 0
+
+
+def nudge_spool(spool) -> None:
+    """Replay at most one spooled batch from a hook, handing any backlog to a detached drainer.
+
+    Skipped while the spool is backing off after a failed send, so a down or
+    hung server doesn't stall every hook.
+    """
+    if spool.backing_off():
+        return
+    try:
+        drained = spool.drain(lambda batch: post_batch(batch, HOOK_DRAIN_TIMEOUT), max_batches=1)
+    except OSError:
+        return
+    if drained.more:
+        spawn_detached("send_event.py", "--drain")
+
+
+def post_event(event: dict, full: dict | None = None) -> str | None:
+    """Deliver an event via the relay or spool when enabled, otherwise POST it directly.
+
+    ``full`` is the event without payload refs, for when ``event`` uses
+    them: only the session's home shard holds its blobs, so any other server
+    gets ``full``. With several servers a relayed or spooled batch may fail
+    over, so those always carry ``full``.
+
+    Returns how the event left: "relay" or "spool" once safely handed off,
+    the URL of the server that accepted it, or None if it was dropped.
+    """
+    if full is None:
+        full = event
+    if len(SERVER_URLS) > 1 and (RELAY_ENABLED or SPOOL_ENABLED):
+        event = full
+
+    if RELAY_ENABLED and send_to_relay(event):
+        return "relay"
+
+    if SPOOL_ENABLED:
+        # Persist first so a down or slow server never loses the event,
+        # then replay the oldest batch of the spool (possibly including it)
+        try:
+            spool = get_spool()
+            spool.append(event)
+        except OSError:
+            pass
+        else:
+            nudge_spool(spool)
+            return "spool"
+
+    # Don't block the agent if the server is down
+    status, url = post_routed("/events", event, event.get("session_id", ""), full)
+    return url if 200 <= status < 300 else None
+
+
+def home_stores(route: str | None, session_id: str) -> bool:
+    """Whether the session's home server is bound to store an event that left by ``route``.
+
+    Only then can later events refer to its ``$blob`` fragments by hash. The
+    relay drops batches it can't deliver unless it can spool them, and with
+    several servers a relayed or spooled batch may fail over to another
+    shard, so there only a direct POST accepted by the home shard counts.
+    """
+    if route is None:
+        return False
+    if route in ("relay", "spool"):
+        if len(SERVER_URLS) > 1:
+            return False
+        return route == "spool" or SPOOL_ENABLED
+    return route == home_shard(session_id)
 
 
 if __name__ == "__main__":
-    # When run directly, expect hook_event_type as first arg
-    event_type = sys.argv[1] if len(sys.argv) > 1 else "Unknown"
-    send_event(event_type)
+    if len(sys.argv) > 1 and sys.argv[1] == "--drain":
+        print(f"Replayed {drain_spool()} spooled event(s)")
+        sys.exit(0)
+
+    print("usage: send_event.py --drain  (hooks run through dispatch.py)")
+    sys.exit(2)
@@ -0,0 +1,122 @@
+"""Session-affine routing across several observability servers.
+
+With ``OBSERVABILITY_SERVER_URLS=http://a:4000,http://b:4000,...`` events are
+spread over the servers by consistent hashing on ``session_id``: every
+endpoint owns ``VNODES`` points on a hash ring and a session goes to the
+first endpoint clockwise from its own hash. A session's events therefore
+always land on the same server, and adding or removing a server only moves
+the sessions whose arc changed.
+
+Health is checked passively: the delivery attempt is the probe. An endpoint
+that is unreachable or answers 5xx is marked down in a small JSON file in the
+state directory, shared by every hook invocation and the relay, and traffic
+fails over to the next distinct endpoint on the ring. A down endpoint is
+retried after ``OBSERVABILITY_SHARD_RETRY_S`` seconds, doubling on each
+further failure up to ``MAX_RETRY_AFTER``. The healthy path only reads the
+file; it is rewritten when an endpoint changes state.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import time
+from collections.abc import Callable
+
+from send_event import SERVER_URLS, state_dir
+
+VNODES = 160
+RETRY_AFTER = float(os.environ.get("OBSERVABILITY_SHARD_RETRY_S", "30"))
+MAX_RETRY_AFTER = 300.0
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8", "surrogatepass")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, urls: list[str], vnodes: int = VNODES):
+        points = sorted((_hash(f"{url}#{i}"), url) for url in urls for i in range(vnodes))
+        self.hashes = [h for h, _ in points]
+        self.urls = [url for _, url in points]
+        self.size = len(set(urls))
+
+    def preference(self, key: str) -> list[str]:
+        """Distinct endpoints in ring order starting from ``key``'s position."""
+        order: list[str] = []
+        start = bisect.bisect(self.hashes, _hash(key))
+        for i in range(len(self.urls)):
+            url = self.urls[(start + i) % len(self.urls)]
+            if url not in order:
+                order.append(url)
+                if len(order) == self.size:
+                    break
+        return order
+
+
+class Health:
+    """Cached up/down state per endpoint, shared between processes through a file."""
+
+    def __init__(self):
+        self.path = os.path.join(state_dir(), "shard-health.json")
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def is_up(self, url: str, now: float) -> bool:
+        entry = self.data.get(url)
+        return not entry or entry["retry_at"] <= now
+
+    def record(self, url: str, ok: bool, now: float) -> None:
+        entry = self.data.get(url)
+        if ok:
+            if entry is None:
+                return
+            del self.data[url]
+        else:
+            failures = entry["failures"] + 1 if entry else 1
+            backoff = min(RETRY_AFTER * 2 ** (failures - 1), MAX_RETRY_AFTER)
+            self.data[url] = {"failures": failures, "retry_at": now + backoff}
+        self._save()
+
+    def _save(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+_rings: dict[tuple[str, ...], HashRing] = {}
+
+
+def preference(session_id: str, urls: list[str] = SERVER_URLS) -> list[str]:
+    """Endpoints for a session, owner first, then failover order."""
+    key = tuple(urls)
+    if key not in _rings:
+        _rings[key] = HashRing(urls)
+    return _rings[key].preference(session_id)
+
+
+def post_with_failover(order: list[str], post_to: Callable[[str], int]) -> tuple[int, str]:
+    """POST to the first healthy endpoint in ``order``, failing over down the list.
+
+    ``post_to(url)`` returns an HTTP status, or 0 if the endpoint is
+    unreachable. If every endpoint is marked down, only the first is tried.
+    Returns the last status seen and the endpoint that gave it.
+    """
+    health = Health()
+    now = time.time()
+    candidates = [url for url in order if health.is_up(url, now)] or order[:1]
+    status, url = 0, candidates[0]
+    for url in candidates:
+        status = post_to(url)
+        ok = 0 < status < 500
+        health.record(url, ok, time.time())
+        if ok:
+            break
+    return status, url
@@ -0,0 +1,82 @@
+"""Pairs BeforeTool and AfterTool hook invocations into tool spans.
+
+BeforeTool opens a span in the session state file (state.py): a generated
+``span_id`` plus the time the hook observed the call. AfterTool closes the
+oldest open span for the same tool name and ``tool_input``, so its event can
+carry ``span_id`` and ``duration_ms`` directly instead of consumers joining
+PreToolUse/PostToolUse rows server-side.
+
+Gemini doesn't pass a tool call id to hooks, so spans are keyed by tool name
+plus a hash of the (already size-shaped) ``tool_input``. Identical calls that
+overlap are matched first in, first out. Spans left open longer than
+``OBSERVABILITY_SPAN_TTL`` seconds (a tool that crashed, a hook that didn't
+fire) are dropped.
+"""
+
+import hashlib
+import json
+import os
+
+import state
+
+SPAN_TTL = float(os.environ.get("OBSERVABILITY_SPAN_TTL", "3600"))
+MAX_OPEN_SPANS = 256
+
+
+def _key(tool_name: str, tool_input) -> str:
+    canonical = json.dumps(tool_input, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256(canonical.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return f"{tool_name}:{digest}"
+
+
+def _expire(spans: dict, now: float) -> None:
+    """Drop spans older than SPAN_TTL and, past MAX_OPEN_SPANS, the oldest ones."""
+    cutoff = now - SPAN_TTL
+    for key in list(spans):
+        spans[key] = [s for s in spans[key] if s["started_at"] >= cutoff]
+        if not spans[key]:
+            del spans[key]
+    open_spans = sorted((s["started_at"], key) for key, entries in spans.items() for s in entries)
+    for _, key in open_spans[:max(len(open_spans) - MAX_OPEN_SPANS, 0)]:
+        spans[key].pop(0)
+        if not spans[key]:
+            del spans[key]
+
+
+def start_span(session_id: str, tool_name: str, tool_input, now: float, sampled: bool = True) -> str:
+    """Open a span for a BeforeTool call observed at ``now`` (epoch seconds). Returns its id.
+
+    ``sampled`` records whether the BeforeTool event was sent, so the AfterTool
+    can follow the same sampling decision (sampling.py).
+    """
+    span_id = os.urandom(8).hex()
+    with state.update(session_id) as data:
+        spans = data.setdefault("spans", {})
+        entry = {"span_id": span_id, "started_at": now, "sampled": sampled}
+        spans.setdefault(_key(tool_name, tool_input), []).append(entry)
+        _expire(spans, now)
+    return span_id
+
+
+def end_span(session_id: str, tool_name: str, tool_input, now: float) -> dict | None:
+    """Close the oldest open span matching an AfterTool call. None if there is none.
+
+    Returns ``span_id``, ``duration_ms`` and the span's ``sampled`` flag.
+    """
+    key = _key(tool_name, tool_input)
+    if key not in state.load(session_id).get("spans", {}):
+        return None
+    with state.update(session_id) as data:
+        spans = data.setdefault("spans", {})
+        _expire(spans, now)
+        entries = spans.get(key)
+        if not entries:
+            return None
+        span = entries.pop(0)
+        if not entries:
+            del spans[key]
+    return {
+        "span_id": span["span_id"],
+        "duration_ms": round((now - span["started_at"]) * 1000, 1),
+        "sampled": span.get("sampled", True),
+    }
@@ -0,0 +1,279 @@
+"""Crash-safe on-disk spool for hook events.
+
+Events are appended to numbered segment files under
+``<state dir>/spool/`` and replayed in order by whichever process next wins
+the drain lock. Each record is framed as::
+
+    b"EV" | length (4 bytes, big-endian) | crc32 (4 bytes) | JSON body
+
+so a torn write from a crashed hook is detected and skipped on replay.
+
+Two locks keep appends fast: ``append.lock`` is held only for the duration of
+a single write, ``drain.lock`` for the whole replay. A drain seals the active
+segment (new appends go to a fresh one) and then sends the sealed segments
+without blocking appenders, packing records from consecutive segments into
+batches of up to ``DRAIN_BATCH`` events and ``BATCH_MAX_BYTES`` of JSON (the
+server refuses batch bodies over 10 MB).
+
+A failed send writes ``retry-at`` so hooks can skip replaying for
+``RETRY_AFTER`` seconds instead of each paying for a down or hung server.
+"""
+
+import fcntl
+import json
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, NamedTuple
+
+MAGIC = b"EV"
+HEADER = struct.Struct(">2sII")
+
+SEGMENT_MAX_BYTES = int(os.environ.get("OBSERVABILITY_SPOOL_SEGMENT_BYTES", str(1024 * 1024)))
+SPOOL_MAX_BYTES = int(os.environ.get("OBSERVABILITY_SPOOL_MAX_BYTES", str(64 * 1024 * 1024)))
+DRAIN_BATCH = 100
+BATCH_MAX_BYTES = int(os.environ.get("OBSERVABILITY_BATCH_MAX_BYTES", str(8 * 1024 * 1024)))
+RETRY_AFTER = 5.0
+
+
+class Drained(NamedTuple):
+    sent: int   # events acknowledged
+    more: bool  # events left over (stopped at max_batches or a failed send)
+
+
+@contextmanager
+def _locked(path: str, blocking: bool = True):
+    """Hold an exclusive flock on ``path``. Yields False if non-blocking and busy."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def encode_record(event: dict) -> bytes:
+    body = json.dumps(event, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(MAGIC, len(body), zlib.crc32(body)) + body
+
+
+def take_batch(events: list[dict], max_events: int = DRAIN_BATCH) -> int:
+    """How many events from the front of ``events`` fit in one batch (at least one)."""
+    size = 0
+    for count, event in enumerate(events[:max_events]):
+        size += len(json.dumps(event)) + 1
+        if count and size > BATCH_MAX_BYTES:
+            return count
+    return min(len(events), max_events)
+
+
+def read_records(data: bytes) -> list[dict]:
+    """Decode every intact record in a segment, resyncing past corrupt ones."""
+    events = []
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        magic, length, crc = HEADER.unpack_from(data, pos)
+        body = data[pos + HEADER.size:pos + HEADER.size + length]
+        if magic == MAGIC and len(body) == length and zlib.crc32(body) == crc:
+            try:
+                events.append(json.loads(body))
+            except ValueError:
+                pass
+            pos += HEADER.size + length
+            continue
+        # Torn or corrupt record: skip to the next frame marker
+        nxt = data.find(MAGIC, pos + 1)
+        if nxt < 0:
+            break
+        pos = nxt
+    return events
+
+
+class Spool:
+    def __init__(self, directory: str):
+        self.dir = directory
+        os.makedirs(self.dir, mode=0o700, exist_ok=True)
+        self.append_lock = os.path.join(self.dir, "append.lock")
+        self.drain_lock = os.path.join(self.dir, "drain.lock")
+        self.retry_file = os.path.join(self.dir, "retry-at")
+
+    def segments(self) -> list[str]:
+        """Segment paths, oldest first."""
+        names = sorted(n for n in os.listdir(self.dir) if n.startswith("seg-") and n.endswith(".log"))
+        return [os.path.join(self.dir, n) for n in names]
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.dir, f"seg-{seq:012d}.log")
+
+    @staticmethod
+    def _seq(path: str) -> int:
+        return int(os.path.basename(path)[4:-4])
+
+    def _size(self, path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _evict(self, segments: list[str]) -> None:
+        """Drop oldest segments until total size is under the cap. Never drops the active one."""
+        total = sum(self._size(p) for p in segments)
+        for path in segments[:-1]:
+            if total <= SPOOL_MAX_BYTES:
+                break
+            total -= self._size(path)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def append(self, event: dict) -> None:
+        if not event.get("timestamp"):
+            event = {**event, "timestamp": int(time.time() * 1000)}
+        record = encode_record(event)
+        with _locked(self.append_lock):
+            segments = self.segments()
+            active = segments[-1] if segments else self._segment_path(1)
+            if segments and self._size(active) > 0 and self._size(active) + len(record) > SEGMENT_MAX_BYTES:
+                active = self._segment_path(self._seq(active) + 1)
+                segments.append(active)
+            fd = os.open(active, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, record)  # one write per record
+            finally:
+                os.close(fd)
+            if not segments:
+                segments = [active]
+            self._evict(segments)
+
+    def _seal(self) -> list[str]:
+        """Start a fresh active segment and return the sealed ones, oldest first."""
+        with _locked(self.append_lock):
+            segments = self.segments()
+            if segments and self._size(segments[-1]) > 0:
+                nxt = self._segment_path(self._seq(segments[-1]) + 1)
+                os.close(os.open(nxt, os.O_WRONLY | os.O_CREAT, 0o600))
+                return segments
+            return segments[:-1]
+
+    def backing_off(self) -> bool:
+        """True within RETRY_AFTER seconds of a failed send."""
+        try:
+            with open(self.retry_file, encoding="ascii") as f:
+                return float(f.read() or 0) > time.time()
+        except (OSError, ValueError):
+            return False
+
+    def _set_backoff(self, failed: bool) -> None:
+        try:
+            if failed:
+                with open(self.retry_file, "w", encoding="ascii") as f:
+                    f.write(str(time.time() + RETRY_AFTER))
+            else:
+                os.unlink(self.retry_file)
+        except OSError:
+            pass
+
+    def drain(self, send_batch: Callable[[list[dict]], list[dict]], max_batches: int | None = None) -> Drained:
+        """Replay sealed segments in order, at most ``max_batches`` batches.
+
+        ``send_batch`` returns the events that weren't accepted (empty when
+        the whole batch was). Returns immediately with nothing sent if another
+        process is already draining. Stops at the first batch with rejected
+        events, keeping them and everything after the batch for the next drain.
+        """
+        with _locked(self.drain_lock, blocking=False) as acquired:
+            if not acquired:
+                return Drained(0, False)
+            segments = self._seal()
+            loaded: list[list] = []  # [path, unsent events], oldest first
+            sent = batches = 0
+            more = partial = failed = False
+            while True:
+                # Read just enough segments to fill the next batch
+                while segments and sum(len(events) for _, events in loaded) < DRAIN_BATCH:
+                    path = segments.pop(0)
+                    try:
+                        with open(path, "rb") as f:
+                            events = read_records(f.read())
+                    except FileNotFoundError:
+                        continue  # evicted under us
+                    if events:
+                        loaded.append([path, events])
+                    else:
+                        self._remove(path)  # nothing intact left in it
+                if not loaded:
+                    break
+                if max_batches is not None and batches >= max_batches:
+                    more = True
+                    break
+                pending = [event for _, events in loaded for event in events]
+                batch = pending[:take_batch(pending)]
+                first_path = loaded[0][0]
+                rejected = send_batch(batch)
+                batches += 1
+                sent += len(batch) - len(rejected)
+                finished, partial = self._consume(loaded, len(batch))
+                if rejected:
+                    # Keep only what wasn't accepted, ahead of the rest, and
+                    # write it out before removing any segment it came from
+                    if partial:
+                        loaded[0][1] = rejected + loaded[0][1]
+                    else:
+                        loaded.insert(0, [first_path, rejected])
+                    self._truncate(*loaded[0])
+                    for path in finished:
+                        if path != loaded[0][0]:
+                            self._remove(path)
+                    more = failed = True
+                    partial = False  # already rewritten
+                    break
+                for path in finished:
+                    self._remove(path)
+            if partial:
+                self._truncate(*loaded[0])
+            if failed or sent:
+                self._set_backoff(failed)
+        return Drained(sent, more)
+
+    @staticmethod
+    def _consume(loaded: list[list], count: int) -> tuple[list[str], bool]:
+        """Drop ``count`` sent events from the front of ``loaded``.
+
+        Returns the segments that were sent in full, for the caller to remove,
+        and whether the oldest remaining segment was only partly sent.
+        """
+        finished = []
+        while loaded:
+            path, events = loaded[0]
+            if count < len(events):
+                loaded[0][1] = events[count:]
+                return finished, count > 0
+            count -= len(events)
+            loaded.pop(0)
+            finished.append(path)
+        return finished, False
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _truncate(self, path: str, remaining: list[dict]) -> None:
+        """Rewrite a partially acknowledged segment with only its unsent records."""
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for event in remaining:
+                f.write(encode_record(event))
+        os.replace(tmp, path)
+
+    def pending_bytes(self) -> int:
+        return sum(self._size(p) for p in self.segments())
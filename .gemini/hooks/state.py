@@ -0,0 +1,80 @@
+"""Per-session state shared between hook invocations.
+
+Each hook runs as a fresh process, so anything that must survive from one
+invocation to the next (hashes already sent, open tool spans, ...) lives in a
+small JSON file per session under ``<state dir>/sessions/``. Reads are
+lock-free; ``update`` holds a per-session flock and replaces the file
+atomically, so concurrent hooks for the same session never see a torn file.
+"""
+
+import fcntl
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from send_event import state_dir
+
+# Session files untouched for this long are removed by prune()
+SESSION_TTL = int(os.environ.get("OBSERVABILITY_STATE_TTL", str(24 * 3600)))
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _sessions_dir() -> str:
+    path = os.path.join(state_dir(), "sessions")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def _path(session_id: str) -> str:
+    return os.path.join(_sessions_dir(), _UNSAFE.sub("_", session_id)[:128] + ".json")
+
+
+def load(session_id: str) -> dict:
+    try:
+        with open(_path(session_id), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@contextmanager
+def update(session_id: str):
+    """Yield the session's state dict under an exclusive lock and persist it on exit."""
+    path = _path(session_id)
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        data = load(session_id)
+        yield data
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    finally:
+        os.close(fd)
+
+
+def clear(session_id: str) -> None:
+    path = _path(session_id)
+    for p in (path, path + ".lock"):
+        try:
+            os.unlink(p)
+        except OSError:
+            pass
+
+
+def prune() -> None:
+    """Remove session files that haven't been touched within SESSION_TTL."""
+    cutoff = time.time() - SESSION_TTL
+    directory = _sessions_dir()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,308 @@
+"""Bounded-memory JSON parser for hook stdin.
+
+Tool hooks can receive multi-MB payloads (a file read, a long command
+output). ``load_shaped`` parses the document incrementally from a text stream
+in fixed-size chunks and shapes it as it goes, so the full body is never held
+in memory:
+
+- A string longer than ``max_field_bytes`` (UTF-8) is cut to its head and
+  tail (each about ``max_field_bytes // 2`` characters) joined by a
+  ``[... truncated n bytes ...]`` marker, so it stays a string for consumers.
+  Each cut is listed under the document's top-level ``truncated_fields`` as
+  ``{"path": "tool_response.llmContent", "original_bytes": n, "sha256": ...}``;
+  the hash covers the full decoded value.
+- Once ``max_total_bytes`` of values has been kept, the remaining items of
+  each open array or object are skipped and counted under
+  ``{"omitted_items": n}`` / ``"omitted_keys": n``. The budget is per
+  top-level value and top-level keys are never skipped, so identifiers like
+  ``session_id`` and ``tool_name`` survive a huge ``tool_response`` in front
+  of them, and ``tool_input`` keeps its own share.
+
+Scanning uses ``str.find``, C-level regex and ``json.decoder.scanstring``, so a
+large string costs a handful of Python operations per chunk rather than per
+character.
+"""
+
+import json
+import os
+import re
+from json.decoder import scanstring
+
+MAX_FIELD_BYTES = int(os.environ.get("OBSERVABILITY_MAX_FIELD_BYTES", str(16 * 1024)))
+MAX_TOTAL_BYTES = int(os.environ.get("OBSERVABILITY_MAX_PAYLOAD_BYTES", str(256 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+_WS = re.compile(r"[ \t\n\r]*")
+_CONTROL = re.compile(r"[\x00-\x1f]")
+_SCALAR = re.compile(r"[-+0-9.eEa-z]+")
+_SKIP_RUN = re.compile(r'[^"\[\]{},]*')
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+
+class _StringSink:
+    """Accumulates a string until it exceeds the budget, then keeps only head, tail and hash."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.half = max(budget // 2, 1)
+        self.parts: list[str] | None = []
+        self.nbytes = 0
+        self.hash = None
+        self.head = ""
+        self.tail = ""
+
+    def add(self, text: str) -> None:
+        if not text:
+            return
+        data = text.encode("utf-8", "surrogatepass")
+        self.nbytes += len(data)
+        if self.parts is not None:
+            self.parts.append(text)
+            if self.nbytes <= self.budget:
+                return
+            import hashlib
+
+            full = "".join(self.parts)
+            self.parts = None
+            self.hash = hashlib.sha256(full.encode("utf-8", "surrogatepass"))
+            self.head = full[:self.half]
+            self.tail = full[-self.half:]
+            return
+        self.hash.update(data)
+        self.tail = (self.tail + text)[-self.half:]
+
+    def result(self) -> str:
+        if self.parts is not None:
+            return "".join(self.parts)
+        return f"{self.head}\n[... truncated {self.nbytes} bytes ...]\n{self.tail}"
+
+
+class _Parser:
+    def __init__(self, stream, max_field_bytes: int, max_total_bytes: int):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.max_field_bytes = max_field_bytes
+        self.max_total_bytes = max_total_bytes
+        self.remaining = max_total_bytes
+        self.path: list = []
+        self.truncated: list[dict] = []
+
+    # ─── Buffer ───
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping consumed input. Returns False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at EOF)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    # ─── Values ───
+
+    def parse_value(self, keep: bool = True, top: bool = False):
+        char = self._peek()
+        if char == "{":
+            return self._parse_object(keep, top)
+        if char == "[":
+            return self._parse_array(keep)
+        if char == '"':
+            return self._parse_string(keep)
+        if char == "":
+            raise ValueError("unexpected end of input")
+        return self._parse_scalar()
+
+    def _parse_object(self, keep: bool, top: bool = False):
+        self.pos += 1
+        obj = {} if keep else None
+        if self._peek() == "}":
+            self.pos += 1
+            return obj
+        while True:
+            if keep and not top and self.remaining <= 0:
+                obj["omitted_keys"] = self._skip_rest()
+                return obj
+            if self._peek() != '"':
+                raise ValueError(f"expected object key at offset {self.pos}")
+            key = self._parse_string(keep, budget=1024, is_key=True)
+            self._expect(":")
+            if top:
+                self.remaining = self.max_total_bytes
+            self.path.append(key)
+            value = self.parse_value(keep)
+            self.path.pop()
+            if keep:
+                obj[key] = value
+            sep = self._peek()
+            self.pos += 1
+            if sep == "}":
+                return obj
+            if sep != ",":
+                raise ValueError(f"expected ',' or '}}' at offset {self.pos - 1}")
+
+    def _parse_array(self, keep: bool):
+        self.pos += 1
+        arr = [] if keep else None
+        if self._peek() == "]":
+            self.pos += 1
+            return arr
+        while True:
+            if keep and self.remaining <= 0:
+                arr.append({"omitted_items": self._skip_rest()})
+                return arr
+            self.path.append(len(arr) if keep else None)
+            value = self.parse_value(keep)
+            self.path.pop()
+            if keep:
+                arr.append(value)
+            sep = self._peek()
+            self.pos += 1
+            if sep == "]":
+                return arr
+            if sep != ",":
+                raise ValueError(f"expected ',' or ']' at offset {self.pos - 1}")
+
+    def _skip_rest(self) -> int:
+        """Consume the rest of the open container without building it. Returns its item count.
+
+        Only strings and brackets need individual attention; everything else
+        is skipped a regex run at a time.
+        """
+        depth = 1
+        items = 1
+        while True:
+            self.pos = _SKIP_RUN.match(self.buf, self.pos).end()
+            if self.pos >= len(self.buf):
+                if not self._fill():
+                    raise ValueError("unexpected end of input")
+                continue
+            char = self.buf[self.pos]
+            if char == '"':
+                self._parse_string(False)
+                continue
+            self.pos += 1
+            if char == ",":
+                items += depth == 1
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return items
+
+    def _parse_string(self, keep: bool, budget: int | None = None, is_key: bool = False):
+        self.pos += 1  # opening quote
+        sink = _StringSink(self.max_field_bytes if budget is None else budget) if keep else None
+        while True:
+            end = _closing_quote(self.buf, self.pos)
+            complete = end >= 0
+            if not complete:
+                end = _safe_cut(self.buf, self.pos)
+            if sink is not None and end > self.pos:
+                sink.add(_decode(self.buf[self.pos:end]))
+            self.pos = end
+            if complete:
+                self.pos += 1
+                break
+            if not self._fill():
+                raise ValueError("unterminated string")
+        if sink is None:
+            return None
+        self.remaining -= min(sink.nbytes, self.max_field_bytes)
+        if sink.parts is None:
+            if is_key:
+                return sink.head
+            self.truncated.append({
+                "path": ".".join(str(part) for part in self.path),
+                "original_bytes": sink.nbytes,
+                "sha256": sink.hash.hexdigest(),
+            })
+        return sink.result()
+
+    def _parse_scalar(self):
+        while True:
+            m = _SCALAR.match(self.buf, self.pos)
+            if m and m.end() == len(self.buf) and self._fill():
+                continue
+            break
+        if not m:
+            raise ValueError(f"unexpected character at offset {self.pos}")
+        self.pos = m.end()
+        self.remaining -= len(m.group())
+        return json.loads(m.group())
+
+
+def _decode(raw: str) -> str:
+    """Decode JSON string content (without quotes). Raises ValueError on bad escapes."""
+    if "\\" not in raw:
+        if _CONTROL.search(raw):
+            raise ValueError("invalid control character in string")
+        return raw
+    return scanstring(raw + '"', 0)[0]
+
+
+def _escaped(buf: str, start: int, index: int) -> bool:
+    """True if buf[index] is preceded by an odd run of backslashes (within buf[start:])."""
+    run = 0
+    index -= 1
+    while index >= start and buf[index] == "\\":
+        run += 1
+        index -= 1
+    return run % 2 == 1
+
+
+def _closing_quote(buf: str, start: int) -> int:
+    """Index of the unescaped quote ending the string that starts at ``start``, or -1."""
+    index = buf.find('"', start)
+    while index >= 0 and _escaped(buf, start, index):
+        index = buf.find('"', index + 1)
+    return index
+
+
+def _safe_cut(buf: str, start: int) -> int:
+    """Largest end <= len(buf) that doesn't split an escape sequence or surrogate pair."""
+    end = len(buf)
+    # An incomplete escape can only start in the last 5 characters
+    last = buf.rfind("\\", max(start, end - 5), end)
+    if last >= 0 and not _escaped(buf, start, last):
+        length = 6 if buf[last + 1:last + 2] == "u" else 2
+        if last + length > end:
+            end = last
+    if end - start >= 6 and _HIGH_SURROGATE.match(buf, end - 6) and not _escaped(buf, start, end - 6):
+        end -= 6
+    return end
+
+
+def load_shaped(stream, max_field_bytes: int = MAX_FIELD_BYTES, max_total_bytes: int = MAX_TOTAL_BYTES):
+    """Parse one JSON document from ``stream`` with size shaping. Returns None for empty input.
+
+    Raises ValueError on malformed JSON.
+    """
+    parser = _Parser(stream, max_field_bytes, max_total_bytes)
+    if parser._peek() == "":
+        return None
+    value = parser.parse_value(top=True)
+    if parser._peek() != "":
+        raise ValueError(f"trailing data at offset {parser.pos}")
+    if parser.truncated and isinstance(value, dict):
+        value["truncated_fields"] = parser.truncated
+    return value
@@ -0,0 +1,119 @@
+"""Payload dedup wire format ($blob/$ref) and the per-session LRU of sent hashes."""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dedup  # noqa: E402
+import state  # noqa: E402
+from dedup import dedup_payload, record_sent  # noqa: E402
+
+SESSION = "session-1"
+BIG = "x" * 200
+
+
+def sha(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class DedupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for patcher in (mock.patch.dict(os.environ, {"OBSERVABILITY_STATE_DIR": self.tmp.name}),
+                        mock.patch.object(dedup, "MIN_BYTES", 64),
+                        mock.patch.object(dedup, "DEDUP_ENABLED", True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def send(self, payload: dict, session_id: str = SESSION) -> dict:
+        """Dedup ``payload`` and record it as delivered, like an accepted POST."""
+        wire, _, new, hits = dedup_payload(session_id, payload)
+        record_sent(session_id, new, hits)
+        return wire
+
+
+class WireForm(DedupTestCase):
+    def test_first_send_defines_repeat_refers(self):
+        wire, uses_refs, new, hits = dedup_payload(SESSION, {"prompt": BIG})
+        self.assertEqual(wire, {"prompt": {"$blob": sha(BIG), "value": BIG}})
+        self.assertTrue(uses_refs)
+        self.assertEqual((new, hits), ([sha(BIG)], []))
+        record_sent(SESSION, new, hits)
+
+        wire, uses_refs, new, hits = dedup_payload(SESSION, {"prompt": BIG})
+        self.assertEqual(wire, {"prompt": {"$ref": sha(BIG)}})
+        self.assertTrue(uses_refs)
+        self.assertEqual((new, hits), ([], [sha(BIG)]))
+
+    def test_small_values_untouched(self):
+        payload = {"tool_name": "ls", "tool_input": {"path": "/tmp"}}
+        self.assertEqual(dedup_payload(SESSION, payload), (payload, False, [], []))
+
+    def test_nothing_remembered_until_recorded(self):
+        dedup_payload(SESSION, {"prompt": BIG})
+        wire, *_ = dedup_payload(SESSION, {"prompt": BIG})
+        self.assertIn("$blob", wire["prompt"])
+
+    def test_repeat_within_one_payload(self):
+        wire, _, new, _ = dedup_payload(SESSION, {"a": BIG, "b": BIG})
+        self.assertEqual(wire["b"], {"$ref": sha(BIG)})
+        self.assertEqual(new, [sha(BIG)])
+
+    def test_top_level_value_hashed_in_ref_form(self):
+        tool_input = {"content": BIG, "path": "/tmp/a.txt"}
+        ref_form = {"content": {"$ref": sha(BIG)}, "path": "/tmp/a.txt"}
+        wire = self.send({"tool_input": tool_input})
+        self.assertEqual(wire["tool_input"], {
+            "$blob": sha(ref_form),
+            "value": {"content": {"$blob": sha(BIG), "value": BIG}, "path": "/tmp/a.txt"},
+        })
+        self.assertEqual(self.send({"tool_input": tool_input}), {"tool_input": {"$ref": sha(ref_form)}})
+
+    def test_top_level_hash_ignores_which_strings_were_new(self):
+        tool_input = {"content": BIG, "path": "/tmp/a.txt"}
+        fresh = self.send({"tool_input": tool_input}, "fresh")
+        self.send({"prompt": BIG}, "seen")
+        seen = self.send({"tool_input": tool_input}, "seen")
+        self.assertEqual(seen["tool_input"]["value"]["content"], {"$ref": sha(BIG)})
+        self.assertEqual(seen["tool_input"]["$blob"], fresh["tool_input"]["$blob"])
+
+    def test_disabled(self):
+        with mock.patch.object(dedup, "DEDUP_ENABLED", False):
+            self.assertEqual(dedup_payload(SESSION, {"prompt": BIG}), ({"prompt": BIG}, False, [], []))
+
+
+class SentLRU(DedupTestCase):
+    def test_keeps_newest(self):
+        with mock.patch.object(dedup, "LRU_SIZE", 3):
+            record_sent(SESSION, ["a", "b"], [])
+            record_sent(SESSION, ["c", "d", "e"], [])
+        self.assertEqual(state.load(SESSION)["sent"], ["c", "d", "e"])
+
+    def test_hits_move_to_the_end(self):
+        with mock.patch.object(dedup, "LRU_SIZE", 3):
+            record_sent(SESSION, ["a", "b", "c"], [])
+            record_sent(SESSION, ["d"], ["a"])
+        self.assertEqual(state.load(SESSION)["sent"], ["c", "a", "d"])
+
+    def test_evicted_hash_is_sent_in_full_again(self):
+        self.send({"prompt": BIG})
+        with mock.patch.object(dedup, "LRU_SIZE", 1):
+            self.send({"prompt": "y" * 200})
+        wire, *_ = dedup_payload(SESSION, {"prompt": BIG})
+        self.assertEqual(wire["prompt"], {"$blob": sha(BIG), "value": BIG})
+
+    def test_nothing_to_record_leaves_state_alone(self):
+        record_sent(SESSION, [], [])
+        self.assertEqual(state.load(SESSION), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
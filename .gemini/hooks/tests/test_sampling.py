@@ -0,0 +1,147 @@
+"""Per-session tool event sampling: token bucket, pairing, errors and rollups."""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sampling  # noqa: E402
+import state  # noqa: E402
+from dispatch import pair_and_sample  # noqa: E402
+from sampling import admit  # noqa: E402
+
+SESSION = "session-1"
+T0 = 1_700_000_000.0
+
+
+def tool(name: str = "read_file", error: bool = False) -> dict:
+    payload = {"tool_name": name, "tool_input": {"path": "/tmp/a"}}
+    if error:
+        payload["tool_response"] = {"error": "no such file"}
+    return payload
+
+
+class SamplingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for patcher in (mock.patch.dict(os.environ, {"OBSERVABILITY_STATE_DIR": self.tmp.name}),
+                        mock.patch.object(sampling, "SAMPLE_RATE", 1.0),
+                        mock.patch.object(sampling, "SAMPLE_BURST", 2.0),
+                        mock.patch.object(sampling, "SAMPLE_WINDOW", 10.0),
+                        mock.patch.object(sampling, "SAMPLING_ENABLED", True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def keep(self, now: float, hook_event_type: str = "PreToolUse", payload: dict | None = None, paired=None):
+        keep, _ = admit(SESSION, hook_event_type, payload or tool(), now, paired)
+        return keep
+
+
+class TokenBucket(SamplingTestCase):
+    def test_burst_then_suppressed(self):
+        self.assertEqual([self.keep(T0) for _ in range(4)], [True, True, False, False])
+
+    def test_refills_at_rate(self):
+        for _ in range(3):
+            self.keep(T0)
+        self.assertFalse(self.keep(T0 + 0.5))
+        self.assertTrue(self.keep(T0 + 1.5))
+        self.assertFalse(self.keep(T0 + 1.5))
+
+    def test_refill_capped_at_burst(self):
+        self.keep(T0)
+        self.assertEqual([self.keep(T0 + 100) for _ in range(3)], [True, True, False])
+
+    def test_buckets_are_per_session(self):
+        for _ in range(3):
+            self.keep(T0)
+        self.assertTrue(admit("other-session", "PreToolUse", tool(), T0)[0])
+
+    def test_disabled_keeps_everything(self):
+        with mock.patch.object(sampling, "SAMPLING_ENABLED", False):
+            self.assertTrue(all(self.keep(T0) for _ in range(10)))
+        self.assertEqual(state.load(SESSION), {})
+
+
+class Decisions(SamplingTestCase):
+    def test_after_tool_follows_before_tool(self):
+        self.assertFalse(self.keep(T0, "PostToolUse", paired=False))
+        for _ in range(2):
+            self.keep(T0)
+        self.assertTrue(self.keep(T0, "PostToolUse", paired=True))
+
+    def test_paired_through_spans(self):
+        decisions = []
+        for _ in range(3):
+            before = tool()
+            keep, _ = pair_and_sample("BeforeTool", SESSION, "PreToolUse", before, {}, T0)
+            after = tool()
+            kept_after, _ = pair_and_sample("AfterTool", SESSION, "PostToolUse", after, {}, T0 + 1)
+            self.assertEqual(after["span_id"], before["span_id"])
+            decisions.append((keep, kept_after))
+        self.assertEqual(decisions, [(True, True), (True, True), (False, False)])
+
+    def test_errors_always_kept(self):
+        for _ in range(3):
+            self.keep(T0)
+        self.assertTrue(self.keep(T0, "PostToolUse", tool(error=True)))
+        self.assertTrue(self.keep(T0, "PostToolUse", tool(error=True), paired=False))
+        self.assertTrue(self.keep(T0, "PostToolUse", {"tool_name": "x", "tool_response": {"success": False}}))
+
+    def test_non_tool_events_always_kept(self):
+        for _ in range(3):
+            self.keep(T0)
+        for hook_event_type in ("SessionStart", "UserPromptSubmit", "Stop", "Notification"):
+            self.assertTrue(self.keep(T0, hook_event_type, {}))
+
+
+class Rollups(SamplingTestCase):
+    def suppress(self, now: float, count: int, name: str = "read_file") -> None:
+        for _ in range(count):
+            keep, rollup = admit(SESSION, "PreToolUse", tool(name), now)
+            self.assertFalse(keep)
+            self.assertIsNone(rollup)
+
+    def test_emitted_once_the_window_elapses(self):
+        for _ in range(2):
+            self.keep(T0)
+        self.suppress(T0, 3)
+        self.suppress(T0 + 0.1, 1, "glob")
+        keep, rollup = admit(SESSION, "PostToolUse", tool(), T0 + 10, paired=False)
+        self.assertFalse(keep)
+        self.assertEqual(rollup, {
+            "window_start": int(T0 * 1000),
+            "window_end": int((T0 + 10) * 1000),
+            "suppressed": {"read_file": {"PreToolUse": 3, "PostToolUse": 1}, "glob": {"PreToolUse": 1}},
+            "suppressed_total": 5,
+            "sample_rate": 1.0,
+            "sample_burst": 2.0,
+        })
+        self.assertNotIn("suppressed", state.load(SESSION))
+
+    def test_kept_event_can_carry_the_rollup(self):
+        for _ in range(2):
+            self.keep(T0)
+        self.suppress(T0, 1)
+        keep, rollup = admit(SESSION, "UserPromptSubmit", {}, T0 + 11)
+        self.assertTrue(keep)
+        self.assertEqual(rollup["suppressed_total"], 1)
+
+    def test_emitted_at_session_end(self):
+        for _ in range(2):
+            self.keep(T0)
+        self.suppress(T0, 2)
+        keep, rollup = admit(SESSION, "SessionEnd", {}, T0 + 1)
+        self.assertTrue(keep)
+        self.assertEqual(rollup["suppressed"], {"read_file": {"PreToolUse": 2}})
+
+    def test_nothing_suppressed_no_rollup(self):
+        self.keep(T0)
+        self.assertEqual(admit(SESSION, "SessionEnd", {}, T0 + 100), (True, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Consistent-hash ring stability and failover order."""
+
+import os
+import sys
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import send_event  # noqa: E402
+import shards  # noqa: E402
+from send_event import group_by_shard  # noqa: E402
+from shards import MAX_RETRY_AFTER, RETRY_AFTER, HashRing, Health, post_with_failover  # noqa: E402
+
+URLS = ["http://a:4000", "http://b:4000", "http://c:4000"]
+SESSIONS = [f"session-{i:05d}" for i in range(3000)]
+
+
+class Ring(unittest.TestCase):
+    def test_preference_lists_every_endpoint_once(self):
+        ring = HashRing(URLS)
+        for key in SESSIONS[:200]:
+            order = ring.preference(key)
+            self.assertEqual(sorted(order), sorted(URLS))
+
+    def test_stable_across_instances_and_input_order(self):
+        first, second = HashRing(URLS), HashRing(list(reversed(URLS)))
+        for key in SESSIONS:
+            self.assertEqual(first.preference(key), second.preference(key))
+
+    def test_load_is_roughly_even(self):
+        ring = HashRing(URLS)
+        owners = Counter(ring.preference(key)[0] for key in SESSIONS)
+        for url in URLS:
+            self.assertGreater(owners[url], len(SESSIONS) / len(URLS) * 0.7)
+
+    def test_adding_a_server_only_moves_sessions_to_it(self):
+        before = HashRing(URLS)
+        after = HashRing(URLS + ["http://d:4000"])
+        moved = [k for k in SESSIONS if before.preference(k)[0] != after.preference(k)[0]]
+        self.assertTrue(all(after.preference(k)[0] == "http://d:4000" for k in moved))
+        self.assertLess(len(moved), len(SESSIONS) / 4 * 1.3)
+
+    def test_removing_a_server_moves_its_sessions_to_their_failover(self):
+        before = HashRing(URLS)
+        after = HashRing([url for url in URLS if url != "http://b:4000"])
+        for key in SESSIONS:
+            order = before.preference(key)
+            if order[0] == "http://b:4000":
+                self.assertEqual(after.preference(key)[0], order[1])
+            else:
+                self.assertEqual(after.preference(key)[0], order[0])
+
+    def test_single_server(self):
+        self.assertEqual(HashRing(URLS[:1]).preference("anything"), URLS[:1])
+
+    def test_group_by_shard_keeps_order_within_groups(self):
+        events = [{"session_id": key, "i": i} for i, key in enumerate(SESSIONS[:50] * 2)]
+        groups = group_by_shard(events, URLS)
+        self.assertEqual(sum(len(group) for _, group in groups), len(events))
+        ring = HashRing(URLS)
+        for order, group in groups:
+            self.assertTrue(all(ring.preference(e["session_id"]) == order for e in group))
+            self.assertEqual([e["i"] for e in group], sorted(e["i"] for e in group))
+
+
+class Failover(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"OBSERVABILITY_STATE_DIR": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def post(self, statuses: dict[str, int]):
+        """post_with_failover against fake endpoints; returns (result, endpoints tried)."""
+        tried = []
+
+        def post_to(url):
+            tried.append(url)
+            return statuses.get(url, 200)
+
+        return post_with_failover(URLS, post_to), tried
+
+    def test_healthy_owner_is_the_only_one_tried(self):
+        self.assertEqual(self.post({}), ((200, URLS[0]), URLS[:1]))
+
+    def test_fails_over_in_ring_order(self):
+        result, tried = self.post({URLS[0]: 0, URLS[1]: 503})
+        self.assertEqual(result, (200, URLS[2]))
+        self.assertEqual(tried, URLS)
+
+    def test_down_endpoints_are_skipped_until_retry(self):
+        self.post({URLS[0]: 0})
+        result, tried = self.post({})
+        self.assertEqual(result, (200, URLS[1]))
+        self.assertEqual(tried, URLS[1:2])
+
+        later = shards.time.time() + RETRY_AFTER + 1
+        with mock.patch.object(shards.time, "time", return_value=later):
+            result, tried = self.post({})
+        self.assertEqual(result, (200, URLS[0]))
+        self.assertEqual(Health().data, {})
+
+    def test_client_errors_count_as_up(self):
+        result, tried = self.post({URLS[0]: 400})
+        self.assertEqual(result, (400, URLS[0]))
+        self.assertEqual(tried, URLS[:1])
+        self.assertTrue(Health().is_up(URLS[0], shards.time.time()))
+
+    def test_all_down_tries_only_the_owner(self):
+        self.post({url: 0 for url in URLS})
+        result, tried = self.post({url: 0 for url in URLS})
+        self.assertEqual(result, (0, URLS[0]))
+        self.assertEqual(tried, URLS[:1])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        health = Health()
+        now = 1000.0
+        delays = []
+        for _ in range(12):
+            health.record(URLS[0], False, now)
+            delays.append(health.data[URLS[0]]["retry_at"] - now)
+        self.assertEqual(delays[:3], [RETRY_AFTER, RETRY_AFTER * 2, RETRY_AFTER * 4])
+        self.assertEqual(delays[-1], MAX_RETRY_AFTER)
+        health.record(URLS[0], True, now)
+        self.assertEqual(Health().data, {})
+
+
+class DedupedFailover(unittest.TestCase):
+    """A deduped event only goes to the home shard; failover attempts carry the full payload."""
+
+    setUp = Failover.setUp
+
+    def send(self, statuses: dict[str, int], session_id: str):
+        deduped = {"session_id": session_id, "payload": {"$ref": "h"}, "payload_refs": True}
+        full = {"session_id": session_id, "payload": {"big": "x" * 2000}}
+        sent = []
+
+        def http_post(path, body, timeout=2.0, base_url=None):
+            sent.append((base_url, body))
+            return statuses.get(base_url, 200)
+
+        with mock.patch.object(send_event, "SERVER_URLS", URLS), \
+                mock.patch.object(send_event, "http_post", http_post):
+            route = send_event.post_event(deduped, full)
+        return route, sent, deduped, full
+
+    def test_home_shard_gets_deduped_payload(self):
+        home = shards.preference(SESSIONS[0], URLS)[0]
+        route, sent, deduped, _ = self.send({}, SESSIONS[0])
+        self.assertEqual(route, home)
+        self.assertEqual(sent, [(home, deduped)])
+
+    def test_failover_shard_gets_full_payload(self):
+        order = shards.preference(SESSIONS[0], URLS)
+        route, sent, deduped, full = self.send({order[0]: 503}, SESSIONS[0])
+        self.assertEqual(route, order[1])
+        self.assertEqual(sent, [(order[0], deduped), (order[1], full)])
+        with mock.patch.object(send_event, "SERVER_URLS", URLS):
+            self.assertFalse(send_event.home_stores(route, SESSIONS[0]))
+
+    def test_home_marked_down_skips_straight_to_full_payload(self):
+        order = shards.preference(SESSIONS[0], URLS)
+        Health().record(order[0], False, shards.time.time())
+        route, sent, _, full = self.send({}, SESSIONS[0])
+        self.assertEqual(route, order[1])
+        self.assertEqual(sent, [(order[1], full)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""BeforeTool/AfterTool span pairing: FIFO matching, TTL and open-span cap."""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import spans  # noqa: E402
+import state  # noqa: E402
+from spans import end_span, start_span  # noqa: E402
+
+SESSION = "session-1"
+T0 = 1_700_000_000.0
+INPUT = {"command": "ls -la"}
+
+
+class SpansTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"OBSERVABILITY_STATE_DIR": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+
+class Pairing(SpansTestCase):
+    def test_end_returns_span_and_duration(self):
+        span_id = start_span(SESSION, "run_shell_command", INPUT, T0)
+        span = end_span(SESSION, "run_shell_command", INPUT, T0 + 1.25)
+        self.assertEqual(span, {"span_id": span_id, "duration_ms": 1250.0, "sampled": True})
+        self.assertEqual(state.load(SESSION)["spans"], {})
+
+    def test_identical_overlapping_calls_match_first_in_first_out(self):
+        first = start_span(SESSION, "run_shell_command", INPUT, T0)
+        second = start_span(SESSION, "run_shell_command", dict(INPUT), T0 + 1)
+        self.assertNotEqual(first, second)
+        a = end_span(SESSION, "run_shell_command", INPUT, T0 + 5)
+        b = end_span(SESSION, "run_shell_command", INPUT, T0 + 6)
+        self.assertEqual((a["span_id"], a["duration_ms"]), (first, 5000.0))
+        self.assertEqual((b["span_id"], b["duration_ms"]), (second, 5000.0))
+        self.assertIsNone(end_span(SESSION, "run_shell_command", INPUT, T0 + 7))
+
+    def test_key_ignores_input_key_order(self):
+        span_id = start_span(SESSION, "edit", {"a": 1, "b": 2}, T0)
+        self.assertEqual(end_span(SESSION, "edit", {"b": 2, "a": 1}, T0 + 1)["span_id"], span_id)
+
+    def test_different_tool_or_input_does_not_match(self):
+        start_span(SESSION, "run_shell_command", INPUT, T0)
+        self.assertIsNone(end_span(SESSION, "run_shell_command", {"command": "pwd"}, T0 + 1))
+        self.assertIsNone(end_span(SESSION, "read_file", INPUT, T0 + 1))
+        self.assertIsNone(end_span("other-session", "run_shell_command", INPUT, T0 + 1))
+
+    def test_sampled_flag_is_carried(self):
+        start_span(SESSION, "run_shell_command", INPUT, T0, sampled=False)
+        self.assertFalse(end_span(SESSION, "run_shell_command", INPUT, T0 + 1)["sampled"])
+
+
+class Expiry(SpansTestCase):
+    def test_spans_past_ttl_are_dropped(self):
+        with mock.patch.object(spans, "SPAN_TTL", 10):
+            start_span(SESSION, "run_shell_command", INPUT, T0)
+            self.assertIsNone(end_span(SESSION, "run_shell_command", INPUT, T0 + 11))
+            self.assertEqual(state.load(SESSION)["spans"], {})
+
+    def test_ttl_only_drops_stale_duplicates(self):
+        with mock.patch.object(spans, "SPAN_TTL", 10):
+            start_span(SESSION, "run_shell_command", INPUT, T0)
+            fresh = start_span(SESSION, "run_shell_command", INPUT, T0 + 8)
+            span = end_span(SESSION, "run_shell_command", INPUT, T0 + 12)
+        self.assertEqual((span["span_id"], span["duration_ms"]), (fresh, 4000.0))
+
+    def test_oldest_spans_dropped_past_the_cap(self):
+        with mock.patch.object(spans, "MAX_OPEN_SPANS", 3):
+            ids = [start_span(SESSION, "read_file", {"path": f"/f{i}"}, T0 + i) for i in range(5)]
+            for i in range(2):
+                self.assertIsNone(end_span(SESSION, "read_file", {"path": f"/f{i}"}, T0 + 10))
+            for i in range(2, 5):
+                self.assertEqual(end_span(SESSION, "read_file", {"path": f"/f{i}"}, T0 + 10)["span_id"], ids[i])
+
+    def test_cap_counts_duplicates_individually(self):
+        with mock.patch.object(spans, "MAX_OPEN_SPANS", 2):
+            start_span(SESSION, "run_shell_command", INPUT, T0)
+            second = start_span(SESSION, "run_shell_command", INPUT, T0 + 1)
+            third = start_span(SESSION, "run_shell_command", INPUT, T0 + 2)
+            self.assertEqual(end_span(SESSION, "run_shell_command", INPUT, T0 + 3)["span_id"], second)
+            self.assertEqual(end_span(SESSION, "run_shell_command", INPUT, T0 + 3)["span_id"], third)
+
+
+if __name__ == "__main__":
+    unittest.main()
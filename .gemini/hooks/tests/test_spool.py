@@ -0,0 +1,267 @@
+"""Spool framing, torn-record recovery, partial acknowledgement and eviction."""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import spool  # noqa: E402
+from send_event import deliver_batch  # noqa: E402
+from spool import HEADER, Spool, encode_record, read_records  # noqa: E402
+
+
+def event(i: int, session: str = "s0", pad: int = 0) -> dict:
+    return {"session_id": session, "i": i, "timestamp": 1, "pad": "x" * pad}
+
+
+class SpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool = Spool(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pending(self) -> list[int]:
+        """Event numbers still on disk, in replay order."""
+        out = []
+        for path in self.spool.segments():
+            with open(path, "rb") as f:
+                out += [e["i"] for e in read_records(f.read())]
+        return out
+
+
+class Framing(unittest.TestCase):
+    def test_round_trip(self):
+        events = [event(i) for i in range(5)] + [{"unicode": "café \U0001F600"}]
+        data = b"".join(encode_record(e) for e in events)
+        self.assertEqual(read_records(data), events)
+
+    def test_torn_tail_is_dropped(self):
+        data = encode_record(event(0)) + encode_record(event(1))
+        for cut in range(1, len(encode_record(event(1)))):
+            with self.subTest(cut=cut):
+                self.assertEqual(read_records(data[:-cut]), [event(0)])
+
+    def test_resyncs_after_torn_record_mid_segment(self):
+        # A hook crashed after writing half a record; later appends follow it
+        torn = encode_record(event(1))[:HEADER.size + 3]
+        data = encode_record(event(0)) + torn + encode_record(event(2)) + encode_record(event(3))
+        self.assertEqual(read_records(data), [event(0), event(2), event(3)])
+
+    def test_skips_corrupt_body(self):
+        bad = bytearray(encode_record(event(1)))
+        bad[-2] ^= 0xFF  # body no longer matches its crc
+        data = encode_record(event(0)) + bytes(bad) + encode_record(event(2))
+        self.assertEqual(read_records(data), [event(0), event(2)])
+
+    def test_garbage_between_records(self):
+        data = b"garbage" + encode_record(event(0)) + b"EVEV\x00" + encode_record(event(1))
+        self.assertEqual(read_records(data), [event(0), event(1)])
+
+
+class Drain(SpoolTestCase):
+    def test_replays_in_order_and_empties_spool(self):
+        for i in range(250):
+            self.spool.append(event(i))
+        batches = []
+        result = self.spool.drain(lambda batch: batches.append([e["i"] for e in batch]) or [])
+        self.assertEqual(result, spool.Drained(250, False))
+        self.assertEqual([len(b) for b in batches], [100, 100, 50])
+        self.assertEqual(sum(batches, []), list(range(250)))
+        self.assertEqual(self.pending(), [])
+
+    def test_batches_span_segments(self):
+        with mock.patch.object(spool, "SEGMENT_MAX_BYTES", 600):
+            for i in range(30):
+                self.spool.append(event(i, pad=100))
+        self.assertGreater(len(self.spool.segments()), 5)
+        sizes = []
+        self.spool.drain(lambda batch: sizes.append(len(batch)) or [])
+        self.assertEqual(sizes, [30])
+
+    def test_batches_are_capped_by_size(self):
+        for i in range(10):
+            self.spool.append(event(i, pad=300))
+        sizes = []
+        with mock.patch.object(spool, "BATCH_MAX_BYTES", 1000):
+            self.spool.drain(lambda batch: sizes.append(len(batch)) or [])
+        self.assertEqual(sizes, [2, 2, 2, 2, 2])
+
+    def test_oversized_event_goes_alone(self):
+        self.spool.append(event(0, pad=5000))
+        self.spool.append(event(1))
+        sizes = []
+        with mock.patch.object(spool, "BATCH_MAX_BYTES", 1000):
+            self.spool.drain(lambda batch: sizes.append(len(batch)) or [])
+        self.assertEqual(sizes, [1, 1])
+
+    def test_max_batches_truncates_partly_sent_segment(self):
+        for i in range(250):
+            self.spool.append(event(i))
+        result = self.spool.drain(lambda batch: [], max_batches=1)
+        self.assertEqual(result, spool.Drained(100, True))
+        self.assertEqual(self.pending(), list(range(100, 250)))
+        self.assertFalse(os.path.exists(self.spool.segments()[0] + ".tmp"))
+
+    def test_failed_batch_is_kept_and_backs_off(self):
+        for i in range(150):
+            self.spool.append(event(i))
+        result = self.spool.drain(lambda batch: batch)
+        self.assertEqual(result, spool.Drained(0, True))
+        self.assertEqual(self.pending(), list(range(150)))
+        self.assertTrue(self.spool.backing_off())
+
+        self.assertEqual(self.spool.drain(lambda batch: []).sent, 150)
+        self.assertFalse(self.spool.backing_off())
+
+    def test_backoff_expires(self):
+        self.spool.append(event(0))
+        self.spool.drain(lambda batch: batch)
+        with mock.patch.object(time, "time", return_value=time.time() + spool.RETRY_AFTER + 1):
+            self.assertFalse(self.spool.backing_off())
+
+    def test_only_rejected_events_are_kept(self):
+        for i in range(250):
+            self.spool.append(event(i, session=f"s{i % 2}"))
+
+        def reject_odd_session(batch):
+            return [e for e in batch if e["session_id"] == "s1"]
+
+        result = self.spool.drain(reject_odd_session)
+        self.assertEqual(result, spool.Drained(50, True))
+        rejected = [i for i in range(100) if i % 2]
+        self.assertEqual(self.pending(), rejected + list(range(100, 250)))
+
+    def test_rejected_events_survive_fully_consumed_segment(self):
+        with mock.patch.object(spool, "SEGMENT_MAX_BYTES", 300):
+            for i in range(6):
+                self.spool.append(event(i, pad=100))
+        result = self.spool.drain(lambda batch: batch[:1])
+        self.assertEqual(result, spool.Drained(5, True))
+        self.assertEqual(self.pending(), [0])
+
+    def test_rejected_events_kept_when_batch_ends_mid_segment(self):
+        with mock.patch.object(spool, "SEGMENT_MAX_BYTES", 600):
+            for i in range(150):
+                self.spool.append(event(i, pad=100))
+        result = self.spool.drain(lambda batch: batch[:3])
+        self.assertEqual(result, spool.Drained(97, True))
+        self.assertEqual(self.pending(), [0, 1, 2] + list(range(100, 150)))
+
+    def test_crash_while_keeping_rejected_events_loses_nothing(self):
+        with mock.patch.object(spool, "SEGMENT_MAX_BYTES", 300):
+            for i in range(6):
+                self.spool.append(event(i, pad=100))
+        # Die before the rejected events are written back: no segment they
+        # came from may be gone yet
+        with mock.patch.object(Spool, "_truncate", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self.spool.drain(lambda batch: batch[:1])
+        self.assertEqual(self.pending(), list(range(6)))
+
+    def test_appends_during_drain_go_to_fresh_segment(self):
+        for i in range(3):
+            self.spool.append(event(i))
+
+        def send(batch):
+            self.spool.append(event(99))
+            return batch  # fail, so nothing is removed
+
+        self.spool.drain(send)
+        self.assertEqual(self.pending(), [0, 1, 2, 99])
+
+    def test_busy_drain_lock_returns_immediately(self):
+        self.spool.append(event(0))
+        with spool._locked(self.spool.drain_lock):
+            calls = []
+            result = self.spool.drain(lambda batch: calls.append(batch) or [])
+        self.assertEqual(result, spool.Drained(0, False))
+        self.assertEqual(calls, [])
+        self.assertEqual(self.pending(), [0])
+
+    def test_segment_without_intact_records_is_removed(self):
+        path = os.path.join(self.tmp.name, "seg-000000000001.log")
+        with open(path, "wb") as f:
+            f.write(encode_record(event(0))[:-1])
+        self.spool.append(event(1))
+        sent = []
+        self.spool.drain(lambda batch: sent.extend(e["i"] for e in batch) or [])
+        self.assertEqual(sent, [1])
+        self.assertFalse(os.path.exists(path))
+
+
+class ClientErrors(SpoolTestCase):
+    """Statuses that retrying won't fix must not block the spool."""
+
+    def post(self, limit: int = 1000, status: int = 200):
+        """Fake server: 413 once a batch carries more than ``limit`` bytes of padding, else ``status``."""
+        self.requests = []
+
+        def post(batch):
+            self.requests.append([e["i"] for e in batch])
+            return 413 if sum(len(e["pad"]) for e in batch) > limit else status
+        return post
+
+    def send(self, post):
+        return lambda batch: deliver_batch(batch, post)
+
+    def test_too_large_batch_is_split(self):
+        for i in range(8):
+            self.spool.append(event(i, pad=300))
+        result = self.spool.drain(self.send(self.post(limit=700)))
+        self.assertEqual(result, spool.Drained(8, False))
+        self.assertEqual(self.requests[0], list(range(8)))
+        accepted = [r for r in self.requests if len(r) <= 2]
+        self.assertEqual(sum(accepted, []), list(range(8)))
+        self.assertEqual(self.pending(), [])
+
+    def test_single_oversized_event_is_dropped(self):
+        self.spool.append(event(0, pad=5000))
+        self.spool.append(event(1))
+        with mock.patch("sys.stderr"):
+            result = self.spool.drain(self.send(self.post()))
+        self.assertEqual(self.requests, [[0, 1], [0], [1]])
+        self.assertEqual(result, spool.Drained(2, False))
+        self.assertEqual(self.pending(), [])
+        self.assertFalse(self.spool.backing_off())
+
+    def test_permanent_client_error_is_dropped(self):
+        for i in range(3):
+            self.spool.append(event(i))
+        with mock.patch("sys.stderr"):
+            self.spool.drain(self.send(self.post(status=400)))
+        self.assertEqual(self.pending(), [])
+
+    def test_throttling_and_server_errors_are_retried(self):
+        for status in (0, 408, 429, 500, 503):
+            with self.subTest(status=status):
+                self.assertEqual(deliver_batch([event(0)], self.post(status=status)), [event(0)])
+
+
+class Eviction(SpoolTestCase):
+    def test_cap_drops_oldest_segments(self):
+        record = len(encode_record(event(0, pad=400)))
+        with mock.patch.object(spool, "SEGMENT_MAX_BYTES", record * 2), \
+                mock.patch.object(spool, "SPOOL_MAX_BYTES", record * 6):
+            for i in range(20):
+                self.spool.append(event(i, pad=400))
+            self.assertLessEqual(self.spool.pending_bytes(), record * 6)
+        # Whole segments go, oldest first; the newest events are all there
+        pending = self.pending()
+        self.assertEqual(pending, list(range(20 - len(pending), 20)))
+        self.assertGreaterEqual(len(pending), 5)
+
+    def test_never_evicts_active_segment(self):
+        big = len(encode_record(event(0, pad=4000)))
+        with mock.patch.object(spool, "SPOOL_MAX_BYTES", big // 2):
+            self.spool.append(event(0, pad=4000))
+            self.spool.append(event(1, pad=4000))
+        self.assertEqual(self.pending(), [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""stream_json.load_shaped against json.loads, including chunk-boundary edge cases."""
+
+import hashlib
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stream_json import load_shaped  # noqa: E402
+
+
+class TrickleReader:
+    """Text stream that returns at most ``step`` characters per read, to force chunk boundaries."""
+
+    def __init__(self, text: str, step: int):
+        self.text = text
+        self.step = step
+        self.pos = 0
+
+    def read(self, size: int = -1) -> str:
+        chunk = self.text[self.pos:self.pos + min(size, self.step)]
+        self.pos += len(chunk)
+        return chunk
+
+
+DOCUMENTS = [
+    {},
+    [],
+    {"a": [], "b": {}, "c": [[], [{}]]},
+    {"session_id": "abc", "n": -12, "f": 1.5e-3, "big": 12345678901234567890, "t": True, "x": False, "z": None},
+    [0, -0.0, 1e10, 3.14159, "", " ", "\u00e9\u4e2d"],
+    {"quote": 'say "hi"', "backslash": "C:\\Users\\dev\\", "mixed": '\\"\\\\"'},
+    {"controls": "tab\there\nnewline\r\u0000\u001f", "slash": "a/b"},
+    {"emoji": "\U0001F600 grin \U0001F680", "cjk": "\u6f22\u5b57", "combining": "e\u0301"},
+    {"lone_high": "\ud83d", "lone_low": "\ude00"},
+    {"nested": {"deep": {"deeper": [1, {"k": ["v", "\U0001F4A9"]}]}}},
+    {"tool_name": "run_shell_command", "tool_input": {"command": "ls -la && echo \"done\""}},
+]
+
+
+class MatchesJsonLoads(unittest.TestCase):
+    def check(self, text: str, step: int | None = None) -> None:
+        stream = io.StringIO(text) if step is None else TrickleReader(text, step)
+        self.assertEqual(load_shaped(stream), json.loads(text))
+
+    def test_documents(self):
+        for doc in DOCUMENTS:
+            for ensure_ascii in (True, False):
+                text = json.dumps(doc, ensure_ascii=ensure_ascii)
+                with self.subTest(text=text):
+                    self.check(text)
+
+    def test_every_chunk_boundary(self):
+        # Reads of 1..7 characters put a boundary at every offset inside
+        # escapes (\", \\, \uXXXX) and between the halves of surrogate pairs
+        for doc in DOCUMENTS:
+            for ensure_ascii in (True, False):
+                text = json.dumps(doc, ensure_ascii=ensure_ascii)
+                for step in range(1, 8):
+                    with self.subTest(text=text, step=step):
+                        self.check(text, step)
+
+    def test_surrogate_pair_split_across_chunks(self):
+        text = json.dumps({"s": "ab\U0001F600cd"})  # "ab\ud83d\ude00cd"
+        split = text.index("\\ude00")
+        for offset in range(split - 6, split + 7):
+            reader = TrickleReader(text, offset)
+            with self.subTest(offset=offset):
+                self.assertEqual(load_shaped(reader), {"s": "ab\U0001F600cd"})
+
+    def test_whitespace_and_formatting(self):
+        text = json.dumps(DOCUMENTS[9], indent=4)
+        self.check(text)
+        self.check(text, 3)
+        self.check("  \n\t{ \"a\" :\n[ 1 , 2 ] }  \n")
+
+    def test_empty_input(self):
+        self.assertIsNone(load_shaped(io.StringIO("")))
+        self.assertIsNone(load_shaped(io.StringIO("  \n ")))
+
+    def test_malformed_input(self):
+        for text in ['{"a": "unterminated', '{"a": 1} trailing', '{"a": "\\x"}', '{"a": "raw\x01control"}',
+                     '{"a" 1}', '{"a": 1 "b": 2}', '[1, 2', '{"a": }', '{1: 2}']:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    load_shaped(io.StringIO(text))
+
+
+class Shaping(unittest.TestCase):
+    def test_long_string_keeps_head_tail_and_reports_cut(self):
+        value = "".join(f"line {i}: caf\u00e9 \"quoted\" \\ \U0001F600\n" for i in range(2000))
+        text = json.dumps({"tool_response": {"llmContent": value}})
+        for step in (None, 7):
+            stream = io.StringIO(text) if step is None else TrickleReader(text, step)
+            with self.subTest(step=step):
+                data = load_shaped(stream, max_field_bytes=1024)
+                shaped = data["tool_response"]["llmContent"]
+                self.assertIsInstance(shaped, str)
+                self.assertTrue(shaped.startswith(value[:512]))
+                self.assertTrue(shaped.endswith(value[-512:]))
+                original = value.encode("utf-8", "surrogatepass")
+                self.assertIn(f"[... truncated {len(original)} bytes ...]", shaped)
+                self.assertEqual(data["truncated_fields"], [{
+                    "path": "tool_response.llmContent",
+                    "original_bytes": len(original),
+                    "sha256": hashlib.sha256(original).hexdigest(),
+                }])
+
+    def test_short_strings_untouched(self):
+        data = load_shaped(io.StringIO(json.dumps({"prompt": "x" * 1024})), max_field_bytes=1024)
+        self.assertEqual(data, {"prompt": "x" * 1024})
+
+    def test_array_paths(self):
+        text = json.dumps({"edits": [{"new": "short"}, {"new": "y" * 5000}]})
+        data = load_shaped(io.StringIO(text), max_field_bytes=1024)
+        self.assertEqual(data["truncated_fields"][0]["path"], "edits.1.new")
+
+    def test_budget_skips_items_but_keeps_top_level_fields(self):
+        doc = {"tool_response": {"lines": ["y" * 100] * 5000}, "session_id": "real-session", "tool_name": "ls",
+               "tool_input": {"path": "/tmp"}}
+        data = load_shaped(io.StringIO(json.dumps(doc)), max_total_bytes=10_000)
+        self.assertEqual(data["session_id"], "real-session")
+        self.assertEqual(data["tool_name"], "ls")
+        self.assertEqual(data["tool_input"], {"path": "/tmp"})
+        lines = data["tool_response"]["lines"]
+        kept = len(lines) - 1
+        self.assertEqual(lines[-1], {"omitted_items": 5000 - kept})
+        self.assertEqual(lines[:kept], ["y" * 100] * kept)
+
+    def test_budget_counts_omitted_keys(self):
+        inner = {f"k{i}": "v" * 50 for i in range(100)}
+        data = load_shaped(io.StringIO(json.dumps({"tool_response": inner})), max_total_bytes=1000)
+        kept = [k for k in data["tool_response"] if k != "omitted_keys"]
+        self.assertEqual(len(kept) + data["tool_response"]["omitted_keys"], 100)
+
+    def test_skipped_containers_may_hold_anything(self):
+        tricky = ["]", "}", ",", '"', "\\", {"a": ["[", "{"]}, [[[]]]]
+        doc = {"tool_response": [["pad" * 100]] + [tricky] * 50, "after": "kept"}
+        data = load_shaped(io.StringIO(json.dumps(doc)), max_total_bytes=100)
+        self.assertEqual(data["after"], "kept")
+        self.assertEqual(data["tool_response"][-1], {"omitted_items": 50})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Per-phase timing of a hook invocation.
+
+Enabled with ``OBSERVABILITY_HOOK_TIMING``, a comma-separated list of sinks:
+
+- ``file`` — append one JSON line per invocation to
+  ``<state dir>/metrics/hook-timing.jsonl`` (rotated to ``.1`` past 8 MB)
+- ``payload`` — attach the phases measured before sending as
+  ``hook_timing_ms`` in the event payload
+
+Phases, in milliseconds:
+
+- ``interpreter`` — CPU time the process used before dispatch.py started,
+  i.e. interpreter start-up (wall time isn't observable from inside the
+  process)
+- ``imports`` — dispatch.py's own module imports
+- ``stdin_read`` / ``parse`` — time blocked reading stdin vs. parsing it; the
+  streaming parser interleaves the two, so reads are timed individually
+- ``build`` — payload build, span pairing, sampling and dedup
+- ``send`` — relay handoff, spool or HTTP POST (file sink only)
+- ``total`` — from dispatch.py starting to the end of the invocation
+"""
+
+import json
+import os
+import time
+
+from send_event import state_dir
+
+SINKS = {s.strip() for s in os.environ.get("OBSERVABILITY_HOOK_TIMING", "").split(",") if s.strip()}
+if "1" in SINKS:
+    SINKS.add("file")
+TIMING_ENABLED = bool(SINKS & {"file", "payload"})
+MAX_METRICS_BYTES = 8 * 1024 * 1024
+
+
+class TimedReader:
+    """Wraps a text stream, accumulating the time spent blocked in read()."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.seconds = 0.0
+
+    def read(self, size: int = -1) -> str:
+        start = time.perf_counter()
+        try:
+            return self.stream.read(size)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class HookTimer:
+    def __init__(self, interpreter_ms: float, started: float):
+        self.phases = {"interpreter": round(interpreter_ms, 2)}
+        self.started = started
+        self.last = started
+
+    def mark(self, phase: str) -> None:
+        """Attribute the time since the previous mark to ``phase``."""
+        now = time.perf_counter()
+        self.phases[phase] = round(self.phases.get(phase, 0) + (now - self.last) * 1000, 2)
+        self.last = now
+
+    def split_read(self, reader: TimedReader) -> None:
+        """Split the ``parse`` phase into the part spent reading stdin and the rest."""
+        read_ms = min(reader.seconds * 1000, self.phases.get("parse", 0))
+        self.phases["stdin_read"] = round(read_ms, 2)
+        self.phases["parse"] = round(self.phases.get("parse", 0) - read_ms, 2)
+
+    def snapshot(self) -> dict:
+        return dict(self.phases, total=round((time.perf_counter() - self.started) * 1000, 2))
+
+    def write(self, record: dict) -> None:
+        """Append the finished timings plus ``record`` fields to the metrics file."""
+        if "file" not in SINKS:
+            return
+        directory = os.path.join(state_dir(), "metrics")
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        path = os.path.join(directory, "hook-timing.jsonl")
+        line = json.dumps(dict(record, ts=int(time.time() * 1000), phases_ms=self.snapshot()))
+        try:
+            if os.path.getsize(path) > MAX_METRICS_BYTES:
+                os.replace(path, path + ".1")
+        except OSError:
+            pass
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, (line + "\n").encode())
+        finally:
+            os.close(fd)
@@ -11,6 +11,7 @@ const EVENT_TYPE_EMOJIS: Record<string, string> = {
   UserPromptSubmit: '\u{1F4DD}', // memo
   SessionStart: '\u{1F7E2}',    // green circle
   SessionEnd: '\u26AB',          // black circle
+  SampledRollup: '\u{1F4CA}',   // bar chart
   TeammateIdle: '\u{1F634}',    // sleeping face
   TaskCompleted: '\u{1F3C1}',   // checkered flag
   ConfigChange: '\u2699\uFE0F', // gear
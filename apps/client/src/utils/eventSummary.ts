@@ -75,6 +75,15 @@ export function getEventSummary(event: HookEvent): string {
     return 'User prompt submitted';
   }
 
+  // Sampling rollup — tool events suppressed by hook-side sampling
+  if (type === 'SampledRollup') {
+    const suppressed: Record<string, Record<string, number>> = event.payload?.suppressed || {};
+    const perTool = Object.entries(suppressed)
+      .map(([tool, counts]) => `${tool} \u00D7${Object.values(counts).reduce((a, b) => a + b, 0)}`)
+      .join(', ');
+    return `Sampled out ${event.payload?.suppressed_total ?? 0} tool event(s)${perTool ? ` (${perTool})` : ''}`;
+  }
+
   // Tool-based events (PreToolUse / PostToolUse)
   if (toolName) {
     const isPost = type === 'PostToolUse';
@@ -30,6 +30,22 @@ export function initDatabase(dbPath: string = 'events.db'): void {
   db.exec('CREATE INDEX IF NOT EXISTS idx_hook_event_type ON events(hook_event_type)');
   db.exec('CREATE INDEX IF NOT EXISTS idx_timestamp ON events(timestamp)');
 
+  // Content-addressed payload fragments referenced by deduped hook events
+  db.exec(`
+    CREATE TABLE IF NOT EXISTS payload_blobs (
+      hash TEXT PRIMARY KEY,
+      content TEXT NOT NULL,
+      created_at INTEGER NOT NULL,
+      last_used_at INTEGER NOT NULL DEFAULT 0
+    )
+  `);
+  const blobColumns = db.prepare('PRAGMA table_info(payload_blobs)').all() as { name: string }[];
+  if (!blobColumns.some(col => col.name === 'last_used_at')) {
+    db.exec('ALTER TABLE payload_blobs ADD COLUMN last_used_at INTEGER NOT NULL DEFAULT 0');
+    db.exec('UPDATE payload_blobs SET last_used_at = created_at');
+  }
+  db.exec('CREATE INDEX IF NOT EXISTS idx_payload_blobs_last_used ON payload_blobs(last_used_at)');
+
   db.exec(`
     CREATE TABLE IF NOT EXISTS messages (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -184,6 +200,31 @@ export function insertEvent(event: HookEvent): HookEvent {
   };
 }
 
+export function insertEvents(events: HookEvent[]): HookEvent[] {
+  const insertMany = db.transaction((evts: HookEvent[]) => evts.map(insertEvent));
+  return insertMany(events);
+}
+
+export function storePayloadBlob(hash: string, content: string): void {
+  const now = Date.now();
+  db.prepare(`
+    INSERT INTO payload_blobs (hash, content, created_at, last_used_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(hash) DO UPDATE SET last_used_at = excluded.last_used_at
+  `).run(hash, content, now, now);
+}
+
+// Looking a blob up marks it as used, so prunePayloadBlobs keeps it
+export function getPayloadBlob(hash: string): string | null {
+  const row = db.prepare('UPDATE payload_blobs SET last_used_at = ? WHERE hash = ? RETURNING content')
+    .get(Date.now(), hash) as { content: string } | null;
+  return row ? row.content : null;
+}
+
+// Delete blobs neither stored nor referenced within maxAgeMs. Returns how many were removed.
+export function prunePayloadBlobs(maxAgeMs: number): number {
+  return db.prepare('DELETE FROM payload_blobs WHERE last_used_at < ?').run(Date.now() - maxAgeMs).changes;
+}
+
 export function getFilterOptions(): FilterOptions {
   const sourceApps = db.prepare('SELECT DISTINCT source_app FROM events ORDER BY source_app').all() as { source_app: string }[];
   const sessionIds = db.prepare('SELECT DISTINCT session_id FROM events ORDER BY session_id DESC LIMIT 300').all() as { session_id: string }[];
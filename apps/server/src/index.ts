@@ -1,24 +1,68 @@
-import { initDatabase, insertEvent, getFilterOptions, getRecentEvents, updateEventHITLResponse, insertMessages, getSessionMessages, listTranscriptSessions, getDistinctProjects, getHistoricalInsights, getSessionAnalysis, listSessionAnalyses, upsertSessionAnalysis } from './db';
+import { initDatabase, insertEvent, insertEvents, prunePayloadBlobs, getFilterOptions, getRecentEvents, updateEventHITLResponse, insertMessages, getSessionMessages, listTranscriptSessions, getDistinctProjects, getHistoricalInsights, getSessionAnalysis, listSessionAnalyses, upsertSessionAnalysis } from './db';
 import { createEvalRun, getEvalRun, listEvalRuns, updateEvalRunStatus, deleteEvalRun, insertEvalResults, getEvalResults, getEvalSummary } from './evaluations';
 import { runEvaluation } from './evaluationRunner';
 import { isAnyProviderConfigured, getConfiguredProviders, getProviderList } from './evaluators/llmProvider';
 import { analyzeSession, synthesizeCrossSessions } from './sessionAnalyzer';
+import { resolvePayloadRefs } from './payloadRefs';
 import type { HookEvent, HumanInTheLoopResponse, TranscriptMessage, EvalRunRequest, EvalConfig } from './types';
 
 const MAX_EVENT_SIZE = 2 * 1024 * 1024;       // 2 MB
+const MAX_BATCH_SIZE = 10 * 1024 * 1024;       // 10 MB
 const MAX_TRANSCRIPT_SIZE = 10 * 1024 * 1024;  // 10 MB
 
+// Payload blobs not stored or referenced for this long are deleted; a later
+// $ref to one is kept as { unresolved_ref }
+const PAYLOAD_BLOB_TTL_MS = parseFloat(process.env.PAYLOAD_BLOB_TTL_DAYS || '7') * 24 * 60 * 60 * 1000;
+const PAYLOAD_BLOB_PRUNE_INTERVAL_MS = 60 * 60 * 1000;
+
+function payloadTooLarge(maxSize: number, headers: Record<string, string>): Response {
+  return new Response(JSON.stringify({ error: `Payload too large (max ${maxSize} bytes)` }), {
+    status: 413,
+    headers: { ...headers, 'Content-Type': 'application/json' },
+  });
+}
+
 function checkBodySize(req: Request, maxSize: number, headers: Record<string, string>): Response | null {
   const contentLength = req.headers.get('Content-Length');
   if (contentLength && parseInt(contentLength) > maxSize) {
-    return new Response(JSON.stringify({ error: `Payload too large (max ${maxSize} bytes)` }), {
-      status: 413,
-      headers: { ...headers, 'Content-Type': 'application/json' },
-    });
+    return payloadTooLarge(maxSize, headers);
   }
   return null;
 }
 
+class PayloadTooLargeError extends Error {}
+
+// Parse a JSON body, inflating it first if the hook sent it gzip-compressed.
+// The size limit applies to the decompressed body: inflation is streamed and
+// stops as soon as the limit is passed, so a gzip bomb is never fully expanded.
+async function readJsonBody(req: Request, maxSize: number): Promise<any> {
+  if (req.headers.get('Content-Encoding') === 'gzip') {
+    if (!req.body) throw new SyntaxError('Empty request body');
+    const reader = req.body.pipeThrough(new DecompressionStream('gzip')).getReader();
+    const chunks: Uint8Array[] = [];
+    let size = 0;
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      size += value.byteLength;
+      if (size > maxSize) {
+        await reader.cancel();
+        throw new PayloadTooLargeError();
+      }
+      chunks.push(value);
+    }
+    return JSON.parse(new TextDecoder().decode(Buffer.concat(chunks)));
+  }
+  return req.json();
+}
+
+// Expand hook-side dedup markers so stored events always carry the full payload
+function expandPayloadRefs(event: HookEvent): HookEvent {
+  if (!event.payload_refs) return event;
+  const { payload_refs: _, ...rest } = event;
+  return { ...rest, payload: resolvePayloadRefs(event.payload) };
+}
+
 async function sendResponseToAgent(
   wsUrl: string,
   response: HumanInTheLoopResponse
@@ -89,7 +133,7 @@ export function createServer(options?: { port?: number; dbPath?: string }) {
       const headers = {
         'Access-Control-Allow-Origin': origin,
         'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Allow-Headers': 'Content-Type, Content-Encoding',
       };
 
       if (req.method === 'OPTIONS') {
@@ -101,7 +145,7 @@ export function createServer(options?: { port?: number; dbPath?: string }) {
         const sizeError = checkBodySize(req, MAX_EVENT_SIZE, headers);
         if (sizeError) return sizeError;
         try {
-          const event: HookEvent = await req.json();
+          const event: HookEvent = await readJsonBody(req, MAX_EVENT_SIZE);
           if (!event.source_app || !event.session_id || !event.hook_event_type || !event.payload) {
             return new Response(JSON.stringify({ error: 'Missing required fields' }), {
               status: 400,
@@ -109,7 +153,7 @@ export function createServer(options?: { port?: number; dbPath?: string }) {
             });
           }
 
-          const savedEvent = insertEvent(event);
+          const savedEvent = insertEvent(expandPayloadRefs(event));
 
           const message = JSON.stringify({ type: 'event', data: savedEvent });
           wsClients.forEach(client => {
@@ -120,6 +164,47 @@ export function createServer(options?: { port?: number; dbPath?: string }) {
             headers: { ...headers, 'Content-Type': 'application/json' },
           });
         } catch (error) {
+          if (error instanceof PayloadTooLargeError) return payloadTooLarge(MAX_EVENT_SIZE, headers);
+          return new Response(JSON.stringify({ error: 'Invalid request' }), {
+            status: 400,
+            headers: { ...headers, 'Content-Type': 'application/json' },
+          });
+        }
+      }
+
+      // POST /events/batch — coalesced events from the hook relay
+      if (url.pathname === '/events/batch' && req.method === 'POST') {
+        const sizeError = checkBodySize(req, MAX_BATCH_SIZE, headers);
+        if (sizeError) return sizeError;
+        try {
+          const body = await readJsonBody(req, MAX_BATCH_SIZE);
+          const events: HookEvent[] = body.events;
+          if (!Array.isArray(events) || events.length === 0) {
+            return new Response(JSON.stringify({ error: 'events array required' }), {
+              status: 400,
+              headers: { ...headers, 'Content-Type': 'application/json' },
+            });
+          }
+
+          // Drop malformed entries instead of failing the whole batch
+          // Expand in order: a $ref may point at a $blob defined earlier in the same batch
+          const valid = events
+            .filter(e => e && e.source_app && e.session_id && e.hook_event_type && e.payload)
+            .map(expandPayloadRefs);
+          const savedEvents = valid.length > 0 ? insertEvents(valid) : [];
+
+          for (const savedEvent of savedEvents) {
+            const message = JSON.stringify({ type: 'event', data: savedEvent });
+            wsClients.forEach(client => {
+              try { client.send(message); } catch (_) { wsClients.delete(client); }
+            });
+          }
+
+          return new Response(JSON.stringify({ inserted: savedEvents.length, total: events.length }), {
+            headers: { ...headers, 'Content-Type': 'application/json' },
+          });
+        } catch (error) {
+          if (error instanceof PayloadTooLargeError) return payloadTooLarge(MAX_BATCH_SIZE, headers);
           return new Response(JSON.stringify({ error: 'Invalid request' }), {
             status: 400,
             headers: { ...headers, 'Content-Type': 'application/json' },
@@ -543,6 +628,8 @@ export function createServer(options?: { port?: number; dbPath?: string }) {
 
 if (import.meta.main) {
   const server = createServer();
+  prunePayloadBlobs(PAYLOAD_BLOB_TTL_MS);
+  setInterval(() => prunePayloadBlobs(PAYLOAD_BLOB_TTL_MS), PAYLOAD_BLOB_PRUNE_INTERVAL_MS);
   console.log(`Server running on http://localhost:${server.port}`);
   console.log(`WebSocket endpoint: ws://localhost:${server.port}/stream`);
   console.log(`POST events to: http://localhost:${server.port}/events`);
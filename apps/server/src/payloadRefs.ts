@@ -0,0 +1,49 @@
+import { storePayloadBlob, getPayloadBlob } from './db';
+
+// Hook-side dedup (.gemini/hooks/dedup.py) replaces repeated payload fragments with
+// { $ref: sha256 } and sends first occurrences as { $blob: sha256, value }.
+const HASH_PATTERN = /^[0-9a-f]{64}$/;
+
+function isBlob(node: any): boolean {
+  return node && typeof node === 'object' && !Array.isArray(node)
+    && Object.keys(node).length === 2 && 'value' in node
+    && typeof node.$blob === 'string' && HASH_PATTERN.test(node.$blob);
+}
+
+function isRef(node: any): boolean {
+  return node && typeof node === 'object' && !Array.isArray(node)
+    && Object.keys(node).length === 1
+    && typeof node.$ref === 'string' && HASH_PATTERN.test(node.$ref);
+}
+
+// Stored form of a blob: nested definitions become references
+function toRefForm(node: any): any {
+  if (isBlob(node)) return { $ref: node.$blob };
+  if (Array.isArray(node)) return node.map(toRefForm);
+  if (node && typeof node === 'object') {
+    return Object.fromEntries(Object.entries(node).map(([k, v]) => [k, toRefForm(v)]));
+  }
+  return node;
+}
+
+/**
+ * Expand $blob/$ref markers in a deduped payload, storing new blobs as they're seen.
+ * Unknown references (e.g. the defining event was lost) become { unresolved_ref: hash }.
+ */
+export function resolvePayloadRefs(node: any, depth = 0): any {
+  if (depth > 32) return node;
+  if (isBlob(node)) {
+    storePayloadBlob(node.$blob, JSON.stringify(toRefForm(node.value)));
+    return resolvePayloadRefs(node.value, depth + 1);
+  }
+  if (isRef(node)) {
+    const content = getPayloadBlob(node.$ref);
+    if (content === null) return { unresolved_ref: node.$ref };
+    return resolvePayloadRefs(JSON.parse(content), depth + 1);
+  }
+  if (Array.isArray(node)) return node.map(item => resolvePayloadRefs(item, depth + 1));
+  if (node && typeof node === 'object') {
+    return Object.fromEntries(Object.entries(node).map(([k, v]) => [k, resolvePayloadRefs(v, depth + 1)]));
+  }
+  return node;
+}
@@ -34,6 +34,7 @@ export interface HookEvent {
   model_name?: string;
   humanInTheLoop?: HumanInTheLoop;
   humanInTheLoopStatus?: HumanInTheLoopStatus;
+  payload_refs?: boolean;  // payload contains $blob/$ref markers (hook-side dedup)
 }
 
 export interface FilterOptions {
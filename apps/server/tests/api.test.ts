@@ -65,6 +65,104 @@ describe('POST /events', () => {
   });
 });
 
+describe('POST /events/batch', () => {
+  test('inserts every event in the batch', async () => {
+    const res = await fetch(`${baseUrl}/events/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        events: [
+          validEvent({ hook_event_type: 'batch-1' }),
+          validEvent({ hook_event_type: 'batch-2' }),
+        ],
+      }),
+    });
+    expect(res.status).toBe(200);
+    const body = await res.json();
+    expect(body.inserted).toBe(2);
+    expect(body.total).toBe(2);
+  });
+
+  test('skips malformed entries', async () => {
+    const res = await fetch(`${baseUrl}/events/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ events: [validEvent(), { source_app: 'x' }] }),
+    });
+    expect(res.status).toBe(200);
+    const body = await res.json();
+    expect(body.inserted).toBe(1);
+    expect(body.total).toBe(2);
+  });
+
+  test('rejects empty array', async () => {
+    const res = await fetch(`${baseUrl}/events/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ events: [] }),
+    });
+    expect(res.status).toBe(400);
+  });
+});
+
+describe('Hook payload dedup + compression', () => {
+  const hash = 'a'.repeat(64);
+
+  test('accepts gzip-compressed event body', async () => {
+    const res = await fetch(`${baseUrl}/events`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+      body: Bun.gzipSync(new TextEncoder().encode(JSON.stringify(validEvent({ hook_event_type: 'gzip-test' })))),
+    });
+    expect(res.status).toBe(200);
+    const body = await res.json();
+    expect(body.hook_event_type).toBe('gzip-test');
+  });
+
+  test('rejects gzip body that inflates past the size limit', async () => {
+    // ~20 KB on the wire, 64 MB once inflated
+    const bomb = Bun.gzipSync(new Uint8Array(64 * 1024 * 1024));
+    const res = await fetch(`${baseUrl}/events`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+      body: bomb,
+    });
+    expect(res.status).toBe(413);
+  });
+
+  test('stores $blob fragments and resolves later $ref', async () => {
+    const first = await postEvent(validEvent({
+      payload_refs: true,
+      payload: { tool_name: 'Write', tool_input: { $blob: hash, value: { content: 'big file' } } },
+    }));
+    const firstBody = await first.json();
+    expect(firstBody.payload.tool_input).toEqual({ content: 'big file' });
+    expect(firstBody.payload_refs).toBeUndefined();
+
+    const second = await postEvent(validEvent({
+      payload_refs: true,
+      payload: { tool_name: 'Write', tool_input: { $ref: hash } },
+    }));
+    const secondBody = await second.json();
+    expect(secondBody.payload.tool_input).toEqual({ content: 'big file' });
+  });
+
+  test('marks unknown references as unresolved', async () => {
+    const res = await postEvent(validEvent({
+      payload_refs: true,
+      payload: { tool_input: { $ref: 'b'.repeat(64) } },
+    }));
+    const body = await res.json();
+    expect(body.payload.tool_input).toEqual({ unresolved_ref: 'b'.repeat(64) });
+  });
+
+  test('leaves $ref untouched without payload_refs flag', async () => {
+    const res = await postEvent(validEvent({ payload: { schema: { $ref: hash } } }));
+    const body = await res.json();
+    expect(body.payload.schema).toEqual({ $ref: hash });
+  });
+});
+
 describe('GET /events/recent', () => {
   test('returns posted events', async () => {
     const res = await fetch(`${baseUrl}/events/recent`);
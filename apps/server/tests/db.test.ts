@@ -1,5 +1,5 @@
-import { describe, test, expect, beforeEach } from 'bun:test';
-import { initDatabase, insertEvent, getRecentEvents, getFilterOptions, updateEventHITLResponse, insertMessages, listTranscriptSessions, getSessionMessages } from '../src/db';
+import { describe, test, expect, beforeEach, afterEach, setSystemTime } from 'bun:test';
+import { initDatabase, insertEvent, getRecentEvents, getFilterOptions, updateEventHITLResponse, insertMessages, listTranscriptSessions, getSessionMessages, storePayloadBlob, getPayloadBlob, prunePayloadBlobs } from '../src/db';
 
 beforeEach(() => {
   initDatabase(':memory:');
@@ -163,3 +163,35 @@ describe('getSessionMessages', () => {
     expect(result).toEqual([]);
   });
 });
+
+describe('payload blobs', () => {
+  const DAY = 24 * 60 * 60 * 1000;
+  const OLD = 'a'.repeat(64);
+  const USED = 'b'.repeat(64);
+
+  afterEach(() => {
+    setSystemTime();
+  });
+
+  test('prunes blobs not stored or referenced within the TTL', () => {
+    setSystemTime(new Date('2026-01-01T00:00:00Z'));
+    storePayloadBlob(OLD, '"old"');
+    storePayloadBlob(USED, '"used"');
+    setSystemTime(new Date('2026-01-05T00:00:00Z'));
+    expect(getPayloadBlob(USED)).toBe('"used"');
+    setSystemTime(new Date('2026-01-09T00:00:00Z'));
+    expect(prunePayloadBlobs(7 * DAY)).toBe(1);
+    expect(getPayloadBlob(OLD)).toBeNull();
+    expect(getPayloadBlob(USED)).toBe('"used"');
+  });
+
+  test('storing a blob again keeps its content and refreshes it', () => {
+    setSystemTime(new Date('2026-01-01T00:00:00Z'));
+    storePayloadBlob(OLD, '"first"');
+    setSystemTime(new Date('2026-01-07T00:00:00Z'));
+    storePayloadBlob(OLD, '"second"');
+    setSystemTime(new Date('2026-01-09T00:00:00Z'));
+    expect(prunePayloadBlobs(7 * DAY)).toBe(0);
+    expect(getPayloadBlob(OLD)).toBe('"first"');
+  });
+});
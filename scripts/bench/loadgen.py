@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""Load generator for the observability server's ingest and broadcast paths.
+
+Simulates ``--sessions`` concurrent agent sessions, each sending a realistic
+mix of hook events (same schema as the hooks: source_app, session_id,
+hook_event_type, payload) to ``POST /events`` with exponential think time
+between events. ``--subscribers`` WebSocket clients stay connected to
+``/stream`` for the whole run. Reports:
+
+- accepted events/sec and error rate (non-2xx responses and connection errors)
+- POST latency (request sent → response read)
+- ingest-to-broadcast latency (request sent → event received on ``/stream``),
+  across all subscribers, plus the fraction of expected broadcasts received
+
+Every event carries ``payload.loadgen = {"run": <run id>, "id": <n>}`` so
+subscribers can match broadcasts to sends without decoding whole frames.
+
+Stdlib only (asyncio streams with minimal HTTP/1.1 and WebSocket clients).
+Only loopback servers are accepted. ``--start-server`` launches a throwaway
+server (``bun src/index.ts``) on a free port with a temporary database, so
+the run doesn't touch ``events.db``. The generator itself is one Python
+process; if its CPU is pinned, latencies include its own queueing, so keep
+``--subscribers`` modest or spread runs across processes.
+
+Usage:
+    python3 scripts/bench/loadgen.py --start-server [--sessions 2000] [--rate 500]
+                                     [--subscribers 20] [--duration 30]
+"""
+
+import argparse
+import asyncio
+import base64
+import bisect
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SERVER_DIR = os.path.join(PROJECT_ROOT, "apps", "server")
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# Relative frequency of each event type inside a session (SessionStart and
+# SessionEnd are sent once, at the ends)
+EVENT_MIX = {
+    "PreToolUse": 34,
+    "PostToolUse": 32,
+    "PostToolUseFailure": 2,
+    "UserPromptSubmit": 8,
+    "Stop": 8,
+    "Notification": 6,
+    "SubagentStart": 2,
+    "SubagentStop": 2,
+    "PreCompact": 1,
+}
+TOOLS = ["Read", "Edit", "Bash", "Grep", "Glob", "Write", "Task", "WebFetch"]
+
+# tool_response / message sizes in bytes, and how often they occur
+PAYLOAD_SIZES = [(300, 55), (2_000, 30), (16_000, 12), (200_000, 3)]
+
+FILLER = ("The quick brown fox jumps over the lazy dog. 0123456789 " * 4096)[:256 * 1024]
+
+
+# ─── Histogram ───
+
+
+class Histogram:
+    """Log-bucketed latency histogram (ms); 5% bucket resolution from 0.05 ms up."""
+
+    BASE = 0.05
+    RATIO = 1.05
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        index = 0 if ms <= self.BASE else int(math.log(ms / self.BASE, self.RATIO)) + 1
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max = max(self.max, ms)
+
+    def _upper(self, index: int) -> float:
+        return self.BASE * self.RATIO ** index
+
+    def percentile(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = math.ceil(self.total * p / 100)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.total,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def render(self, edges=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)) -> list[str]:
+        """Coarse text histogram for the report."""
+        bins = [0] * (len(edges) + 1)
+        for index, count in self.counts.items():
+            bins[bisect.bisect_left(edges, self._upper(index))] += count
+        widest = max(bins) or 1
+        labels = [f"<= {e} ms" for e in edges] + [f">  {edges[-1]} ms"]
+        return [
+            f"  {label:>12} {count:9d} {'#' * round(40 * count / widest)}"
+            for label, count in zip(labels, bins)
+            if count
+        ]
+
+
+# ─── Minimal HTTP/1.1 and WebSocket clients ───
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection; reconnects lazily after errors."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def post(self, path: str, body: bytes) -> int:
+        request = (
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        # A reused connection may have been closed by the server's keep-alive
+        # timeout; retry once on a fresh one
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(request)
+                await self.writer.drain()
+                status, close = await self._read_response()
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                self.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if close:
+                self.close()
+            return status
+
+    async def _read_response(self) -> tuple[int, bool]:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get("content-length", "0")))
+        return status, headers.get("connection") == "close"
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def websocket_connect(host: str, port: int, path: str):
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    if b" 101 " not in head.split(b"\r\n", 1)[0]:
+        writer.close()
+        raise ConnectionError(f"WebSocket upgrade refused: {head.splitlines()[0]!r}")
+    return reader, writer
+
+
+async def websocket_messages(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Yield complete text/binary messages as bytes, answering pings. Ends on close."""
+    fragments: list[bytes] = []
+    while True:
+        first, second = await reader.readexactly(2)
+        opcode, length = first & 0x0F, second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        data = await reader.readexactly(length)
+        if mask:
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        if opcode == 0x8:
+            return
+        if opcode == 0x9:
+            # Client frames must be masked; a zero mask leaves the data unchanged
+            writer.write(bytes([0x8A, 0x80 | len(data)]) + b"\x00\x00\x00\x00" + data)
+            continue
+        if opcode in (0x0, 0x1, 0x2):
+            fragments.append(data)
+            if first & 0x80:
+                yield b"".join(fragments)
+                fragments = []
+
+
+# ─── Load generation ───
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, host: str, port: int) -> None:
+        self.args = args
+        self.host = host
+        self.port = port
+        self.run_id = os.urandom(4).hex()
+        self.marker = re.compile(rb'"loadgen":\{"run":"' + self.run_id.encode() + rb'","id":(\d+)\}')
+        self.pool: asyncio.Queue[HttpConnection] = asyncio.Queue()
+        for _ in range(args.connections):
+            self.pool.put_nowait(HttpConnection(host, port))
+        self.deadline = math.inf
+        self.next_id = 0
+        self.sent_at: dict[int, float] = {}
+        self.sent = 0
+        self.accepted = 0
+        self.errors: dict[str, int] = {}
+        self.subscribed = 0
+        self.expected_broadcasts = 0
+        self.received = 0
+        self.post_latency = Histogram()
+        self.broadcast_latency = Histogram()
+        # Mean think time per session that yields the target aggregate rate
+        self.think = args.sessions / args.rate if args.rate > 0 else 0.0
+
+    def payload(self, event_type: str) -> dict:
+        size = random.choices([s for s, _ in PAYLOAD_SIZES], [w for _, w in PAYLOAD_SIZES])[0]
+        size = int(size * random.uniform(0.5, 1.5))
+        start = random.randrange(0, len(FILLER) - size) if size < len(FILLER) else 0
+        text = FILLER[start:start + size]
+        tool = random.choice(TOOLS)
+        if event_type == "PreToolUse":
+            return {"tool_name": tool, "tool_input": {"file_path": f"/src/module_{random.randrange(500)}.ts"}}
+        if event_type in ("PostToolUse", "PostToolUseFailure"):
+            return {
+                "tool_name": tool,
+                "tool_input": {"file_path": f"/src/module_{random.randrange(500)}.ts"},
+                "tool_response": {"output": text},
+            }
+        if event_type == "UserPromptSubmit":
+            return {"prompt": text[:2000]}
+        if event_type == "Stop":
+            return {"last_assistant_message": text}
+        if event_type == "Notification":
+            return {"message": "Agent needs your permission to use Bash"}
+        if event_type in ("SubagentStart", "SubagentStop"):
+            return {"agent_type": "general-purpose"}
+        return {}
+
+    async def send(self, session_id: str, event_type: str) -> None:
+        event_id = self.next_id
+        self.next_id += 1
+        payload = self.payload(event_type)
+        payload["loadgen"] = {"run": self.run_id, "id": event_id}
+        body = json.dumps(
+            {"source_app": "loadgen", "session_id": session_id, "hook_event_type": event_type, "payload": payload},
+            separators=(",", ":"),
+        ).encode()
+
+        conn = await self.pool.get()
+        try:
+            started = time.perf_counter()
+            self.sent_at[event_id] = started
+            # Broadcasts go to everyone subscribed when the server handles the event
+            subscribers = self.subscribed
+            self.sent += 1
+            try:
+                status = await conn.post("/events", body)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                self.errors[type(e).__name__] = self.errors.get(type(e).__name__, 0) + 1
+                self.sent_at.pop(event_id, None)
+                return
+            self.post_latency.add((time.perf_counter() - started) * 1000)
+            if 200 <= status < 300:
+                self.accepted += 1
+                self.expected_broadcasts += subscribers
+            else:
+                self.errors[f"HTTP {status}"] = self.errors.get(f"HTTP {status}", 0) + 1
+                self.sent_at.pop(event_id, None)
+        finally:
+            self.pool.put_nowait(conn)
+
+    async def pause(self, seconds: float) -> None:
+        """Sleep for ``seconds``, cut short at the end of the run."""
+        await asyncio.sleep(max(min(seconds, self.deadline - time.perf_counter()), 0))
+
+    async def session(self, slot: int) -> None:
+        """One concurrent session slot: sessions start, run a random number of events, end, repeat.
+
+        Sessions still open at the end of the run are cut off without a
+        SessionEnd, so starts and ends stay spread out rather than bunching
+        at the deadline.
+        """
+        types, weights = list(EVENT_MIX), list(EVENT_MIX.values())
+        # Stagger session starts over one think interval
+        await self.pause(random.uniform(0, self.think))
+        generation = 0
+        while time.perf_counter() < self.deadline:
+            session_id = f"loadgen-{self.run_id}-{slot:05d}-{generation}"
+            generation += 1
+            remaining = max(round(random.expovariate(1 / self.args.session_events)), 1)
+            await self.send(session_id, "SessionStart")
+            while remaining:
+                await self.pause(random.expovariate(1 / self.think) if self.think else 0)
+                if time.perf_counter() >= self.deadline:
+                    return
+                remaining -= 1
+                await self.send(session_id, random.choices(types, weights)[0] if remaining else "SessionEnd")
+
+    async def subscriber(self, ready: asyncio.Event) -> None:
+        try:
+            reader, writer = await websocket_connect(self.host, self.port, "/stream")
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            self.errors[f"subscribe {type(e).__name__}"] = self.errors.get(f"subscribe {type(e).__name__}", 0) + 1
+            ready.set()
+            return
+        self.subscribed += 1
+        ready.set()
+        try:
+            async for message in websocket_messages(reader, writer):
+                now = time.perf_counter()
+                if message.startswith(b'{"type":"initial"'):
+                    continue
+                for match in self.marker.finditer(message):
+                    started = self.sent_at.get(int(match.group(1)))
+                    if started is not None:
+                        self.received += 1
+                        self.broadcast_latency.add((now - started) * 1000)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribed -= 1
+            writer.close()
+
+    async def progress(self, started: float) -> None:
+        last_accepted, last_time = 0, started
+        while True:
+            await asyncio.sleep(5)
+            now = time.perf_counter()
+            rate = (self.accepted - last_accepted) / (now - last_time)
+            print(f"  t={now - started:5.0f}s  accepted {self.accepted:8d}  ({rate:7.1f}/s)  "
+                  f"errors {sum(self.errors.values()):5d}  broadcasts {self.received:9d}", file=sys.stderr)
+            last_accepted, last_time = self.accepted, now
+
+    async def run(self) -> dict:
+        readies = [asyncio.Event() for _ in range(self.args.subscribers)]
+        subscribers = [asyncio.create_task(self.subscriber(ready)) for ready in readies]
+        for ready in readies:
+            await ready.wait()
+
+        started = time.perf_counter()
+        self.deadline = started + self.args.duration
+        progress = asyncio.create_task(self.progress(started))
+        sessions = [asyncio.create_task(self.session(i)) for i in range(self.args.sessions)]
+        await asyncio.gather(*sessions)
+        elapsed = time.perf_counter() - started
+
+        # Let in-flight broadcasts arrive before closing the subscribers
+        deadline = time.perf_counter() + self.args.drain
+        while self.received < self.expected_broadcasts and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        progress.cancel()
+        for task in subscribers:
+            task.cancel()
+        await asyncio.gather(*subscribers, return_exceptions=True)
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+        errors = sum(self.errors.values())
+        return {
+            "run_id": self.run_id,
+            "sessions": self.args.sessions,
+            "subscribers": self.args.subscribers,
+            "seconds": elapsed,
+            "sent": self.sent,
+            "accepted": self.accepted,
+            "accepted_per_sec": self.accepted / elapsed,
+            "errors": dict(self.errors),
+            "error_rate": errors / max(self.sent, 1),
+            "post_latency_ms": self.post_latency.summary(),
+            "broadcasts_expected": self.expected_broadcasts,
+            "broadcasts_received": self.received,
+            "broadcast_latency_ms": self.broadcast_latency.summary(),
+        }
+
+
+# ─── Server lifecycle ───
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, db_path: str) -> subprocess.Popen:
+    bun = shutil.which("bun")
+    if bun is None:
+        sys.exit("--start-server needs bun on PATH")
+    proc = subprocess.Popen(
+        [bun, "src/index.ts"], cwd=SERVER_DIR,
+        env=dict(os.environ, SERVER_PORT=str(port), TEST_DB=db_path),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"server exited with status {proc.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    sys.exit("server did not start listening within 15s")
+
+
+def print_report(result: dict, test: LoadTest) -> None:
+    post, bcast = result["post_latency_ms"], result["broadcast_latency_ms"]
+    print(f"\nrun {result['run_id']}: {result['sessions']} sessions, {result['subscribers']} subscribers, "
+          f"{result['seconds']:.1f}s")
+    print(f"accepted        {result['accepted']} events  ({result['accepted_per_sec']:.1f}/s)")
+    print(f"errors          {sum(result['errors'].values())}  ({result['error_rate']:.2%})"
+          + (f"  {result['errors']}" if result["errors"] else ""))
+    print(f"POST latency    p50 {post['p50']:.1f}  p90 {post['p90']:.1f}  p99 {post['p99']:.1f}  "
+          f"max {post['max']:.1f} ms")
+    for line in test.post_latency.render():
+        print(line)
+    if result["subscribers"]:
+        expected = result["broadcasts_expected"]
+        ratio = result["broadcasts_received"] / expected if expected else 0.0
+        print(f"broadcasts      {result['broadcasts_received']} of {expected} expected ({ratio:.1%})")
+        print(f"ingest→broadcast p50 {bcast['p50']:.1f}  p90 {bcast['p90']:.1f}  p99 {bcast['p99']:.1f}  "
+              f"max {bcast['max']:.1f} ms")
+        for line in test.broadcast_latency.render():
+            print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.environ.get('SERVER_PORT', '4000')}",
+                        help="Server to load (loopback only; ignored with --start-server)")
+    parser.add_argument("--start-server", action="store_true",
+                        help="Start a throwaway server with a temporary database")
+    parser.add_argument("--sessions", type=int, default=2000, help="Concurrent simulated agent sessions")
+    parser.add_argument("--session-events", type=float, default=40,
+                        help="Mean events per session before it ends and a new one takes its slot")
+    parser.add_argument("--rate", type=float, default=500,
+                        help="Target aggregate events/sec (0 = as fast as the connections allow)")
+    parser.add_argument("--connections", type=int, default=64, help="Concurrent HTTP connections")
+    parser.add_argument("--subscribers", type=int, default=20, help="WebSocket clients on /stream")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--drain", type=float, default=5, help="Seconds to wait for trailing broadcasts")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable event mix")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.start_server:
+            host, port = "127.0.0.1", free_port()
+            server = start_server(port, os.path.join(tmp, "loadgen.db"))
+        else:
+            url = urllib.parse.urlsplit(args.url)
+            host, port = url.hostname or "127.0.0.1", url.port or 80
+            if host not in LOOPBACK_HOSTS:
+                sys.exit(f"refusing to load non-local server {host!r}")
+        try:
+            test = LoadTest(args, host, port)
+            result = asyncio.run(test.run())
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    print_report(result, test)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Replay benchmark for the Gemini hook dispatcher.
+
+Feeds the recorded hook stdin fixtures in ``fixtures/`` (one per event wired
+in .gemini/settings.json) through ``python3 -IS dispatch.py <Event>`` against
+an in-process stub server, plus "huge" variants of the tool hooks carrying a
+multi-MB file. Two measurements:
+
+- Latency: each case runs ``--runs`` times in a row. Reports p50/p95/p99 wall
+  time per case and the median of each phase from the hooks' own timing
+  metrics (timing.py).
+- Throughput: ``--sessions`` concurrent sessions each replay a full session
+  (SessionStart, prompt, ``--tool-calls`` tool pairs, notification,
+  compression, stop, SessionEnd). Reports hook invocations/sec and events
+  delivered.
+
+OBSERVABILITY_* variables in the environment (e.g. OBSERVABILITY_RELAY=1) are
+passed through to the hooks, so transport modes can be compared. Exits
+non-zero if any case's p95 exceeds ``--max-p95-ms``.
+
+Usage:
+    python3 scripts/bench/replay.py [--runs 20] [--sessions 8] [--huge-mb 4] [--max-p95-ms 250]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_server import StubServer  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, "..", ".."))
+DISPATCH = os.path.join(PROJECT_ROOT, ".gemini", "hooks", "dispatch.py")
+
+EVENTS = [
+    "SessionStart", "BeforeAgent", "BeforeTool", "AfterTool",
+    "Notification", "PreCompress", "AfterAgent", "SessionEnd",
+]
+PHASES = ["interpreter", "imports", "stdin_read", "parse", "build", "send", "total"]
+
+
+def load_fixtures() -> dict[str, dict]:
+    fixtures = {}
+    for event in EVENTS:
+        with open(os.path.join(FIXTURES_DIR, f"{event}.json"), encoding="utf-8") as f:
+            fixtures[event] = json.load(f)
+    return fixtures
+
+
+def huge_file(megabytes: float) -> str:
+    """Source-like text of roughly ``megabytes`` MB, as a read_file or write_file would carry."""
+    line = "    const value = items.map((item) => transform(item, options)).filter(Boolean);\n"
+    return line * max(int(megabytes * 1024 * 1024 / len(line)), 1)
+
+
+def build_cases(fixtures: dict[str, dict], huge_mb: float) -> list[tuple[str, str, dict]]:
+    """(case name, Gemini event, stdin document) for every small fixture plus huge tool variants."""
+    cases = [(event, event, fixtures[event]) for event in EVENTS]
+    content = huge_file(huge_mb)
+    before = dict(fixtures["BeforeTool"], tool_name="write_file",
+                  tool_input={"file_path": "/home/dev/projects/webapp/dist/bundle.js", "content": content})
+    after = dict(fixtures["AfterTool"], tool_response={"llmContent": content, "returnDisplay": ""})
+    cases.append(("BeforeTool (huge)", "BeforeTool", before))
+    cases.append(("AfterTool (huge)", "AfterTool", after))
+    return cases
+
+
+def run_hook(event: str, document: dict, session_id: str, env: dict) -> float:
+    """Run one hook invocation and return its wall time in ms."""
+    stdin = json.dumps(dict(document, session_id=session_id)).encode()
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-IS", DISPATCH, event], input=stdin, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    return (time.perf_counter() - start) * 1000
+
+
+def percentiles(samples: list[float]) -> tuple[float, float, float]:
+    if len(samples) < 2:
+        return samples[0], samples[0], samples[0]
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def read_phases(state_dir: str) -> dict[str, dict[str, list[float]]]:
+    """Phase samples from the hooks' metrics file, grouped by session id."""
+    grouped: dict[str, dict[str, list[float]]] = {}
+    path = os.path.join(state_dir, "metrics", "hook-timing.jsonl")
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                by_phase = grouped.setdefault(record["session_id"], {})
+                for phase, ms in record["phases_ms"].items():
+                    by_phase.setdefault(phase, []).append(ms)
+    except OSError:
+        pass
+    return grouped
+
+
+def session_script(fixtures: dict[str, dict], cases: dict[str, dict], tool_calls: int) -> list[tuple[str, dict]]:
+    script = [("SessionStart", fixtures["SessionStart"]), ("BeforeAgent", fixtures["BeforeAgent"])]
+    for i in range(tool_calls):
+        # Every fifth tool call carries a huge file, the rest are small
+        huge = i % 5 == 4
+        before = cases["BeforeTool (huge)"] if huge else fixtures["BeforeTool"]
+        after = cases["AfterTool (huge)"] if huge else fixtures["AfterTool"]
+        script += [("BeforeTool", before), ("AfterTool", after)]
+    script += [(event, fixtures[event]) for event in ("Notification", "PreCompress", "AfterAgent", "SessionEnd")]
+    return script
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="Invocations per latency case")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions for the throughput run")
+    parser.add_argument("--tool-calls", type=int, default=10, help="Tool call pairs per throughput session")
+    parser.add_argument("--huge-mb", type=float, default=4, help="Size of the huge tool payloads (MB)")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Fail if any case's p95 exceeds this")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    cases = build_cases(fixtures, args.huge_mb)
+    results = {"latency": [], "throughput": {}}
+
+    with StubServer() as stub, tempfile.TemporaryDirectory() as state:
+        env = {k: v for k, v in os.environ.items() if k.startswith("OBSERVABILITY_")}
+        env.update({
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": state,
+            "OBSERVABILITY_SERVER_URL": stub.url,
+            "OBSERVABILITY_STATE_DIR": state,
+            "OBSERVABILITY_HOOK_TIMING": "file",
+        })
+        # Warm the OS page cache and .pyc files before measuring
+        for _ in range(3):
+            run_hook("BeforeTool", fixtures["BeforeTool"], "bench-warmup", env)
+
+        for name, event, document in cases:
+            session_id = "bench-" + name.replace(" (huge)", "-huge")
+            samples = [run_hook(event, document, session_id, env) for _ in range(args.runs)]
+            p50, p95, p99 = percentiles(samples)
+            results["latency"].append({"case": name, "session_id": session_id, "p50": p50, "p95": p95, "p99": p99})
+        phases = read_phases(state)
+
+        by_name = {name: document for name, _, document in cases}
+        script = session_script(fixtures, by_name, args.tool_calls)
+        before = stub.stats["events"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(
+                lambda n: [run_hook(event, doc, f"bench-session-{n}", env) for event, doc in script],
+                range(args.sessions),
+            ))
+        elapsed = time.perf_counter() - start
+        invocations = len(script) * args.sessions
+        results["throughput"] = {
+            "sessions": args.sessions,
+            "invocations": invocations,
+            "seconds": elapsed,
+            "invocations_per_sec": invocations / elapsed,
+            "events_delivered": stub.stats["events"] - before,
+        }
+
+    print(f"{'case':<20} {'p50':>8} {'p95':>8} {'p99':>8}   median phases (ms)")
+    for row in results["latency"]:
+        by_phase = phases.get(row["session_id"], {})
+        row["phases"] = {p: statistics.median(by_phase[p]) for p in PHASES if by_phase.get(p)}
+        breakdown = "  ".join(f"{p} {ms:.1f}" for p, ms in row["phases"].items())
+        print(f"{row['case']:<20} {row['p50']:8.1f} {row['p95']:8.1f} {row['p99']:8.1f}   {breakdown}")
+
+    tp = results["throughput"]
+    print(f"\n{tp['sessions']} concurrent sessions: {tp['invocations']} hook invocations in {tp['seconds']:.2f}s "
+          f"({tp['invocations_per_sec']:.1f}/s), {tp['events_delivered']} events delivered")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_p95_ms is not None:
+        slow = [row for row in results["latency"] if row["p95"] > args.max_p95_ms]
+        for row in slow:
+            print(f"\nFAIL: {row['case']} p95 {row['p95']:.1f} ms exceeds {args.max_p95_ms:.0f} ms")
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark for the Gemini hook dispatcher.
+
+Runs ``python3 -IS dispatch.py BeforeTool`` repeatedly against an in-process
+stub server and compares it with a bare ``python3 -IS -c pass``. The
+difference is the per-invocation overhead the hooks add on top of the
+interpreter. Exits non-zero when the median overhead exceeds the budget, so
+it can gate CI.
+
+Usage:
+    python3 scripts/bench/startup.py [--runs 30] [--budget-ms 60]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_server import StubServer  # noqa: E402
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DISPATCH = os.path.join(PROJECT_ROOT, ".gemini", "hooks", "dispatch.py")
+
+SAMPLE_INPUT = b'{"session_id":"bench-startup","tool_name":"read_file","tool_input":{"path":"README.md"}}'
+
+
+def time_runs(cmd: list[str], runs: int, env: dict, stdin: bytes = b"") -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, input=stdin, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def top_imports(env: dict, limit: int = 8) -> list[tuple[int, str]]:
+    """Most expensive top-level imports from ``-X importtime`` (cumulative µs)."""
+    proc = subprocess.run(
+        [sys.executable, "-IS", "-X", "importtime", DISPATCH, "BeforeTool"],
+        input=SAMPLE_INPUT, env=env, capture_output=True, check=False,
+    )
+    rows = []
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Top-level imports have no extra indentation before the module name
+        if name.startswith(" ") and not name.startswith("  "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("HOOK_STARTUP_BUDGET_MS", "60")),
+                        help="Max median overhead over a bare interpreter (ms)")
+    args = parser.parse_args()
+
+    with StubServer() as stub, tempfile.TemporaryDirectory() as state:
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": state,
+            "OBSERVABILITY_SERVER_URL": stub.url,
+            "OBSERVABILITY_STATE_DIR": state,
+        }
+        # Warm the OS page cache and .pyc files before measuring
+        time_runs([sys.executable, "-IS", DISPATCH, "BeforeTool"], 3, env, SAMPLE_INPUT)
+
+        bare = time_runs([sys.executable, "-IS", "-c", "pass"], args.runs, env)
+        hook = time_runs([sys.executable, "-IS", DISPATCH, "BeforeTool"], args.runs, env, SAMPLE_INPUT)
+        imports = top_imports(env)
+        delivered = stub.stats["events"]
+
+    bare_ms = statistics.median(bare)
+    hook_ms = statistics.median(hook)
+    overhead = hook_ms - bare_ms
+
+    print(f"bare interpreter   median {bare_ms:7.1f} ms")
+    print(f"dispatch BeforeTool median {hook_ms:7.1f} ms  (p95 {statistics.quantiles(hook, n=20)[-1]:.1f} ms)")
+    print(f"hook overhead      median {overhead:7.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"events delivered   {delivered}")
+    print("\nslowest top-level imports (cumulative):")
+    for micros, name in imports:
+        print(f"  {micros / 1000:7.2f} ms  {name}")
+
+    if overhead > args.budget_ms:
+        print(f"\nFAIL: hook overhead {overhead:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""In-process stub of the observability server for hook benchmarks.
+
+Accepts ``POST /events`` and ``POST /events/batch`` and counts what it receives
+without storing anything, so measurements reflect hook cost rather than
+server cost.
+"""
+
+import gzip
+import http.server
+import json
+import threading
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        stats = self.server.stats
+        with self.server.lock:
+            stats["requests"] += 1
+            stats["bytes"] += length
+            if self.path.endswith("/events/batch"):
+                try:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    stats["events"] += len(json.loads(body).get("events", []))
+                except (ValueError, OSError):
+                    pass
+            else:
+                stats["events"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class StubServer:
+    """Context manager running the stub on an ephemeral port in a background thread."""
+
+    def __init__(self) -> None:
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stats = {"requests": 0, "events": 0, "bytes": 0}
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def stats(self) -> dict:
+        with self.httpd.lock:
+            return dict(self.httpd.stats)
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -91,7 +91,7 @@ echo ""
 
 # ─── Check prerequisites ─────────────────────────────────────────────────────
 if ! command -v uv &>/dev/null; then
-  warn "'uv' is not on PATH. Hook scripts require uv to run."
+  warn "'uv' is not on PATH. Claude Code hook scripts require uv to run."
   warn "Install: https://docs.astral.sh/uv/getting-started/installation/"
   if ! $NONINTERACTIVE; then
     echo ""
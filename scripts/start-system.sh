@@ -27,6 +27,14 @@ SERVER_PID=$!
 # Wait for server to be ready
 sleep 2
 
+# Start the hook relay (opt-in) so hooks don't pay for a lazy start
+RELAY_PID=""
+if [[ -n "${OBSERVABILITY_RELAY:-}" && "${OBSERVABILITY_RELAY}" != "0" ]]; then
+  echo "Starting hook relay..."
+  python3 "$PROJECT_ROOT/.gemini/hooks/relay.py" &
+  RELAY_PID=$!
+fi
+
 # Start client
 echo "Starting client..."
 cd "$PROJECT_ROOT/apps/client"
@@ -41,7 +49,7 @@ echo ""
 echo "Press Ctrl+C to stop."
 
 # Trap Ctrl+C to kill both processes
-trap "kill $SERVER_PID $CLIENT_PID 2>/dev/null; exit" INT TERM
+trap "kill $SERVER_PID $CLIENT_PID $RELAY_PID 2>/dev/null; exit" INT TERM
 
 # Wait for either process to exit
 wait